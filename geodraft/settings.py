@@ -17,8 +17,18 @@ INSTALLED_APPS += (
     'versioned_editing',
 )
 
+# Batch audit log writes per request
+MIDDLEWARE += (
+    'versioned_editing.middleware.AuditLogMiddleware',
+)
+
 # Database configuration
 # GeoNode uses two databases: default (Django) and datastore (PostGIS)
+# Connections are kept open between requests. Behind pgbouncer (transaction
+# pooling) they can be kept indefinitely, but server-side cursors must be off.
+USE_PGBOUNCER = os.getenv('USE_PGBOUNCER', 'False').lower() == 'true'
+DATABASE_CONN_MAX_AGE = None if USE_PGBOUNCER else int(os.getenv('DATABASE_CONN_MAX_AGE', '60'))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.contrib.gis.db.backends.postgis',
@@ -27,7 +37,8 @@ DATABASES = {
         'PASSWORD': os.getenv('GEONODE_DATABASE_PASSWORD', 'postgres'),
         'HOST': os.getenv('DATABASE_HOST', 'db'),
         'PORT': os.getenv('DATABASE_PORT', '5432'),
-        'CONN_MAX_AGE': 0,
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'DISABLE_SERVER_SIDE_CURSORS': USE_PGBOUNCER,
         'CONN_TOUT': 900,
         'OPTIONS': {
             'connect_timeout': 10,
@@ -40,7 +51,8 @@ DATABASES = {
         'PASSWORD': os.getenv('GEONODE_GEODATABASE_PASSWORD', 'postgres'),
         'HOST': os.getenv('GEODATABASE_HOST', 'db'),
         'PORT': os.getenv('GEODATABASE_PORT', '5432'),
-        'CONN_MAX_AGE': 0,
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'DISABLE_SERVER_SIDE_CURSORS': USE_PGBOUNCER,
         'CONN_TOUT': 900,
         'OPTIONS': {
             'connect_timeout': 10,
@@ -11,7 +11,7 @@ class UserRoleAdmin(admin.ModelAdmin):
     list_display = ['user', 'group', 'role', 'can_approve_merges', 'can_manage_branches', 'created_at']
     list_filter = ['role', 'can_approve_merges', 'can_manage_branches', 'group']
     search_fields = ['user__username', 'user__email', 'group__title']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'uuid_external', 'created_at', 'updated_at']
     date_hierarchy = 'created_at'
     
     fieldsets = (
@@ -22,7 +22,7 @@ class UserRoleAdmin(admin.ModelAdmin):
             'fields': ('can_approve_merges', 'can_manage_branches')
         }),
         ('Metadata', {
-            'fields': ('id', 'created_at', 'updated_at'),
+            'fields': ('id', 'uuid_external', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
@@ -33,7 +33,7 @@ class EditBranchAdmin(admin.ModelAdmin):
     list_display = ['name', 'layer', 'group', 'created_by', 'status', 'created_at', 'merged_at']
     list_filter = ['status', 'created_at', 'layer', 'group']
     search_fields = ['name', 'description', 'layer__name', 'group__title']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'uuid_external', 'created_at', 'updated_at']
     date_hierarchy = 'created_at'
 
 
@@ -42,8 +42,9 @@ class FeatureVersionAdmin(OSMGeoAdmin):
     list_display = ['feature_id', 'version', 'branch', 'operation', 'created_by', 'created_at']
     list_filter = ['operation', 'is_deleted', 'created_at', 'branch']
     search_fields = ['feature_id', 'properties']
-    readonly_fields = ['id', 'created_at']
+    readonly_fields = ['id', 'uuid_external', 'created_at']
     date_hierarchy = 'created_at'
+    ordering = ['feature_id', '-version']
 
 
 @admin.register(MergeRequest)
@@ -51,7 +52,7 @@ class MergeRequestAdmin(admin.ModelAdmin):
     list_display = ['title', 'source_branch', 'target_branch', 'status', 'created_by', 'created_at']
     list_filter = ['status', 'created_at', 'reviewed_at']
     search_fields = ['title', 'description']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'uuid_external', 'created_at', 'updated_at']
     date_hierarchy = 'created_at'
 
 
@@ -60,7 +61,7 @@ class MergeConflictAdmin(OSMGeoAdmin):
     list_display = ['merge_request', 'feature_id', 'conflict_type', 'resolved', 'resolved_by']
     list_filter = ['conflict_type', 'resolved', 'resolution_strategy']
     search_fields = ['feature_id']
-    readonly_fields = ['id', 'resolved_at']
+    readonly_fields = ['id', 'uuid_external', 'resolved_at']
 
 
 @admin.register(AuditLog)
@@ -7,6 +7,8 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.http import JsonResponse
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Count, Prefetch, Q
 from geonode.groups.models import GroupProfile
 from .models import UserRole
 from .permissions import PermissionManager
@@ -50,17 +52,32 @@ def manage_users(request):
     """
     List and manage users.
     """
-    users = User.objects.all().order_by('username')
+    users = User.objects.prefetch_related(
+        Prefetch(
+            'versioned_editing_roles',
+            queryset=UserRole.objects.select_related('group'),
+            to_attr='prefetched_roles'
+        )
+    ).order_by('username')
+    
+    # Resolve admin status for all users in one query instead of one per row
+    admin_ids = set(
+        UserRole.objects.filter(role='admin').values_list('user_id', flat=True)
+    )
+    # Superusers see every group; share one queryset so it is evaluated once
+    all_groups = GroupProfile.objects.all()
     
     # Add role information for each user
     users_with_roles = []
     for user in users:
-        user_roles = UserRole.objects.filter(user=user).select_related('group')
+        user_roles = user.prefetched_roles
         users_with_roles.append({
             'user': user,
             'roles': user_roles,
-            'groups': PermissionManager.get_user_groups(user),
-            'is_admin': PermissionManager.is_admin(user)
+            'groups': all_groups if user.is_superuser else list(
+                {role.group_id: role.group for role in user_roles}.values()
+            ),
+            'is_admin': user.is_superuser or user.id in admin_ids
         })
     
     context = {
@@ -116,7 +133,7 @@ def remove_user_role(request, role_id):
     Remove a role from a user.
     """
     if request.method == 'POST':
-        role = get_object_or_404(UserRole, id=role_id)
+        role = get_object_or_404(UserRole, uuid_external=role_id)
         user = role.user
         
         try:
@@ -141,16 +158,29 @@ def manage_groups(request):
     """
     List and manage groups.
     """
-    groups = GroupProfile.objects.all().order_by('title')
+    groups = GroupProfile.objects.annotate(
+        total_members=Count('versioned_editing_roles__user', distinct=True),
+        n_admins=Count('versioned_editing_roles', filter=Q(versioned_editing_roles__role='admin')),
+        n_validators=Count('versioned_editing_roles', filter=Q(versioned_editing_roles__role='validator')),
+        n_editors=Count('versioned_editing_roles', filter=Q(versioned_editing_roles__role='editor')),
+    ).prefetch_related(
+        Prefetch(
+            'versioned_editing_roles',
+            queryset=UserRole.objects.select_related('user'),
+            to_attr='prefetched_roles'
+        )
+    ).order_by('title')
     
     # Add member information for each group
     groups_with_members = []
     for group in groups:
-        members = PermissionManager.get_group_members(group)
+        members = {'admins': [], 'validators': [], 'editors': []}
+        for user_role in group.prefetched_roles:
+            members[f'{user_role.role}s'].append(user_role.user)
         groups_with_members.append({
             'group': group,
             'members': members,
-            'total_members': sum(len(m) for m in members.values())
+            'total_members': group.total_members
         })
     
     context = {
@@ -231,15 +261,30 @@ def api_search_users(request):
     if len(query) < 2:
         return JsonResponse({'users': []})
     
-    users = User.objects.filter(username__icontains=query)[:10]
+    # Needs pg_trgm; ILIKE '%q%' is served by the trigram GIN index on username
+    # (both set up by quickstart.sh, see DEPLOYMENT.md)
+    users = list(
+        User.objects.filter(username__icontains=query).annotate(
+            similarity=TrigramSimilarity('username', query)
+        ).order_by('-similarity', 'username').values(
+            'id', 'username', 'email', 'is_superuser'
+        )[:10]
+    )
+    
+    admin_ids = set(
+        UserRole.objects.filter(
+            user_id__in=[user['id'] for user in users],
+            role='admin'
+        ).values_list('user_id', flat=True)
+    )
     
     return JsonResponse({
         'users': [
             {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'is_admin': PermissionManager.is_admin(user)
+                'id': user['id'],
+                'username': user['username'],
+                'email': user['email'],
+                'is_admin': user['is_superuser'] or user['id'] in admin_ids
             }
             for user in users
         ]
@@ -6,17 +6,26 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
 from django.utils import timezone
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.contrib.gis.db.models.functions import Envelope
 from geonode.layers.models import Dataset
-from .models import EditBranch, FeatureVersion, MergeRequest, MergeConflict, AuditLog
+from .models import EditBranch, FeatureVersion, MergeRequest
 from .serializers import (
     EditBranchSerializer,
     FeatureVersionSerializer,
+    FeatureVersionBBoxSerializer,
+    FeatureVersionSummarySerializer,
     MergeRequestSerializer,
     MergeConflictSerializer
 )
-from .services import MergeService, ConflictDetector
+from .services import ConflictDetector
+from .tasks import perform_merge
+from .audit import log_action
+from .permissions import CanApproveMerges
+from .pagination import CreatedAtCursorPagination, EstimatedCountPagination
 import uuid
 
 
@@ -26,6 +35,9 @@ class EditBranchViewSet(viewsets.ModelViewSet):
     """
     serializer_class = EditBranchSerializer
     permission_classes = [IsAuthenticated]
+    lookup_field = 'uuid_external'
+    lookup_url_kwarg = 'pk'
+    pagination_class = EstimatedCountPagination
     
     def get_queryset(self):
         queryset = EditBranch.objects.all()
@@ -45,17 +57,22 @@ class EditBranchViewSet(viewsets.ModelViewSet):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
-        return queryset.select_related('layer', 'created_by', 'parent_branch')
+        serializer_class = self.get_serializer_class()
+        # Listings only load the columns the serializer renders
+        if self.action == 'list':
+            queryset = serializer_class.setup_column_loading(queryset)
+        
+        return serializer_class.setup_eager_loading(queryset)
     
     def perform_create(self, serializer):
         branch = serializer.save(created_by=self.request.user)
         
         # Log action
-        AuditLog.objects.create(
+        log_action(
             user=self.request.user,
             action='CREATE_BRANCH',
             entity_type='branch',
-            entity_id=branch.id,
+            entity_id=branch.uuid_external,
             details={
                 'branch_name': branch.name,
                 'layer_id': str(branch.layer.id),
@@ -66,31 +83,40 @@ class EditBranchViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['delete'])
     def soft_delete(self, request, pk=None):
         """Soft delete a branch by changing its status"""
-        branch = self.get_object()
-        
-        # Check if user owns the branch or is admin
-        if branch.created_by != request.user and not request.user.is_superuser:
-            return Response(
-                {'error': 'You do not have permission to delete this branch'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
-        if branch.is_master():
+        # Single conditional UPDATE: owner (or superuser) and never the master branch
+        try:
+            branches = EditBranch.objects.filter(uuid_external=uuid.UUID(str(pk)))
+        except ValueError:
+            raise Http404
+        branches = branches.exclude(is_master=True)
+        if not request.user.is_superuser:
+            branches = branches.filter(created_by=request.user)
+        
+        updated = branches.update(status='deleted', updated_at=timezone.now())
+        
+        if not updated:
+            # Look the branch up only to report why nothing was deleted
+            branch = self.get_object()
+            
+            if branch.created_by != request.user and not request.user.is_superuser:
+                return Response(
+                    {'error': 'You do not have permission to delete this branch'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            
             return Response(
                 {'error': 'Cannot delete master branch'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        branch.status = 'deleted'
-        branch.save()
-        
         # Log action
-        AuditLog.objects.create(
+        branch_name = branches.values_list('name', flat=True).first()
+        log_action(
             user=request.user,
             action='DELETE_BRANCH',
             entity_type='branch',
-            entity_id=branch.id,
-            details={'branch_name': branch.name}
+            entity_id=pk,
+            details={'branch_name': branch_name}
         )
         
         return Response({'message': 'Branch deleted successfully'})
@@ -102,6 +128,9 @@ class FeatureVersionViewSet(viewsets.ModelViewSet):
     """
     serializer_class = FeatureVersionSerializer
     permission_classes = [IsAuthenticated]
+    lookup_field = 'uuid_external'
+    lookup_url_kwarg = 'pk'
+    pagination_class = CreatedAtCursorPagination
     
     def get_queryset(self):
         queryset = FeatureVersion.objects.all()
@@ -109,7 +138,7 @@ class FeatureVersionViewSet(viewsets.ModelViewSet):
         # Filter by branch
         branch_id = self.request.query_params.get('branch_id')
         if branch_id:
-            queryset = queryset.filter(branch_id=branch_id)
+            queryset = queryset.filter(branch__uuid_external=branch_id)
         
         # Filter by feature_id
         feature_id = self.request.query_params.get('feature_id')
@@ -121,7 +150,42 @@ class FeatureVersionViewSet(viewsets.ModelViewSet):
         if include_deleted.lower() != 'true':
             queryset = queryset.filter(is_deleted=False)
         
-        return queryset.select_related('branch', 'created_by')
+        # Let the database compute bounding boxes instead of sending full geometries
+        if self._bbox_only():
+            queryset = queryset.annotate(bbox=Envelope('geometry')).defer('geometry')
+        
+        # Don't load heavy columns a sparse fieldset leaves out
+        fields = self._requested_fields()
+        if fields is not None:
+            heavy = [name for name in ('geometry', 'properties') if name not in fields]
+            if heavy:
+                queryset = queryset.defer(*heavy)
+        
+        return self.get_serializer_class().setup_eager_loading(queryset)
+    
+    def get_serializer_class(self):
+        serializer_class = super().get_serializer_class()
+        if self._bbox_only():
+            serializer_class = FeatureVersionBBoxSerializer
+        
+        # Sparse fieldsets, e.g. ?fields=id,feature_id,version
+        fields = self._requested_fields()
+        if fields is not None:
+            serializer_class = serializer_class.for_fields(fields)
+        
+        return serializer_class
+    
+    def _requested_fields(self):
+        """Fields asked for with ?fields= on a list request, or None"""
+        fields = self.request.query_params.get('fields')
+        if self.action == 'list' and fields:
+            return fields.split(',')
+        return None
+    
+    def _bbox_only(self):
+        """Check if a list request only asked for feature bounding boxes"""
+        return self.action == 'list' and \
+            self.request.query_params.get('geometry', '').lower() == 'bbox'
     
     def perform_create(self, serializer):
         """Create a new feature version"""
@@ -133,35 +197,35 @@ class FeatureVersionViewSet(viewsets.ModelViewSet):
         )
         
         # Log action
-        AuditLog.objects.create(
+        log_action(
             user=self.request.user,
             action='CREATE_FEATURE',
             entity_type='feature',
-            entity_id=feature.id,
+            entity_id=feature.uuid_external,
             details={
                 'feature_id': str(feature.feature_id),
-                'branch_id': str(feature.branch.id)
+                'branch_id': str(feature.branch.uuid_external)
             }
         )
     
     def perform_update(self, serializer):
         """Update creates a new version of the feature"""
-        old_feature = self.get_object()
+        old_feature = serializer.instance
         
         # Create new version
         feature = serializer.save(
             created_by=self.request.user,
             operation='UPDATE',
             feature_id=old_feature.feature_id,
-            version=old_feature.version + 1
+            version=FeatureVersion.objects.next_version(old_feature.branch_id, old_feature.feature_id)
         )
         
         # Log action
-        AuditLog.objects.create(
+        log_action(
             user=self.request.user,
             action='UPDATE_FEATURE',
             entity_type='feature',
-            entity_id=feature.id,
+            entity_id=feature.uuid_external,
             details={
                 'feature_id': str(feature.feature_id),
                 'version': feature.version
@@ -173,24 +237,25 @@ class FeatureVersionViewSet(viewsets.ModelViewSet):
         """Soft delete a feature by creating a delete version"""
         feature = self.get_object()
         
-        # Create delete version
+        # Create delete tombstone; the payload stays on the previous version
         delete_version = FeatureVersion.objects.create(
             branch=feature.branch,
             feature_id=feature.feature_id,
-            version=feature.version + 1,
-            geometry=feature.geometry,
-            properties=feature.properties,
+            version=FeatureVersion.objects.next_version(feature.branch_id, feature.feature_id),
+            geometry=None,
+            properties={},
+            previous_version=feature,
             operation='DELETE',
             is_deleted=True,
             created_by=request.user
         )
         
         # Log action
-        AuditLog.objects.create(
+        log_action(
             user=request.user,
             action='DELETE_FEATURE',
             entity_type='feature',
-            entity_id=delete_version.id,
+            entity_id=delete_version.uuid_external,
             details={'feature_id': str(feature.feature_id)}
         )
         
@@ -206,10 +271,14 @@ class FeatureVersionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        versions = FeatureVersion.objects.filter(
-            feature_id=feature_id
-        ).order_by('version')
+        versions = FeatureVersion.objects.filter(feature_id=feature_id).order_by('version')
+        
+        # Summary mode skips geometry and model instantiation entirely
+        if request.query_params.get('summary', 'false').lower() == 'true':
+            rows = versions.values(*FeatureVersionSummarySerializer.FIELDS)
+            return Response(FeatureVersionSummarySerializer(rows, many=True).data)
         
+        versions = self.get_serializer_class().setup_eager_loading(versions)
         serializer = self.get_serializer(versions, many=True)
         return Response(serializer.data)
 
@@ -220,6 +289,9 @@ class MergeRequestViewSet(viewsets.ModelViewSet):
     """
     serializer_class = MergeRequestSerializer
     permission_classes = [IsAuthenticated]
+    lookup_field = 'uuid_external'
+    lookup_url_kwarg = 'pk'
+    pagination_class = EstimatedCountPagination
     
     def get_queryset(self):
         queryset = MergeRequest.objects.all()
@@ -234,133 +306,123 @@ class MergeRequestViewSet(viewsets.ModelViewSet):
         if layer_id:
             queryset = queryset.filter(source_branch__layer_id=layer_id)
         
-        return queryset.select_related(
-            'source_branch',
-            'target_branch',
-            'created_by',
-            'reviewed_by'
-        ).prefetch_related('conflicts')
+        return self.get_serializer_class().setup_eager_loading(queryset)
     
+    @transaction.atomic
     def perform_create(self, serializer):
         """Create merge request and detect conflicts"""
         merge_request = serializer.save(created_by=self.request.user)
         
-        # Detect conflicts
+        # Detect and store conflicts
         conflict_detector = ConflictDetector()
-        conflicts = conflict_detector.detect_conflicts(
-            merge_request.source_branch,
-            merge_request.target_branch
-        )
-        
-        # Create conflict records
-        for conflict_data in conflicts:
-            MergeConflict.objects.create(
-                merge_request=merge_request,
-                **conflict_data
-            )
+        conflicts = conflict_detector.create_conflicts(merge_request)
         
         # Update merge request status if conflicts found
         if conflicts:
             merge_request.status = 'conflicts'
-            merge_request.save()
+            merge_request.save(update_fields=['status', 'updated_at'])
         
         # Log action
-        AuditLog.objects.create(
+        log_action(
             user=self.request.user,
             action='CREATE_MERGE_REQUEST',
             entity_type='merge_request',
-            entity_id=merge_request.id,
+            entity_id=merge_request.uuid_external,
             details={
                 'title': merge_request.title,
-                'source_branch': str(merge_request.source_branch.id),
-                'target_branch': str(merge_request.target_branch.id),
+                'source_branch': str(merge_request.source_branch.uuid_external),
+                'target_branch': str(merge_request.target_branch.uuid_external),
                 'conflicts_count': len(conflicts)
             }
         )
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, CanApproveMerges])
     def approve(self, request, pk=None):
         """Approve and merge a merge request"""
         merge_request = self.get_object()
         
-        # Check permissions
-        if not self._can_approve(request.user):
+        # Check for unresolved conflicts (the counters are for display only)
+        unresolved_conflicts = merge_request.conflicts.filter(resolved=False)
+        if unresolved_conflicts.exists():
             return Response(
-                {'error': 'You do not have permission to approve merge requests'},
-                status=status.HTTP_403_FORBIDDEN
+                {'error': f'Cannot merge: {unresolved_conflicts.count()} unresolved conflicts'},
+                status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check for unresolved conflicts
-        unresolved_conflicts = merge_request.conflicts.filter(resolved=False).count()
-        if unresolved_conflicts > 0:
+        # Claim the merge request so concurrent approvals cannot start a second merge
+        previous_status = merge_request.status
+        claimed = MergeRequest.objects.filter(
+            pk=merge_request.pk,
+            status__in=['pending', 'approved', 'conflicts']
+        ).update(status='merging', updated_at=timezone.now())
+        if not claimed:
             return Response(
-                {'error': f'Cannot merge: {unresolved_conflicts} unresolved conflicts'},
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': f'Cannot merge a merge request with status {merge_request.status}'},
+                status=status.HTTP_409_CONFLICT
             )
+        merge_request.status = 'merging'
         
-        # Perform merge
-        merge_service = MergeService()
+        # Perform merge in the background; release the claim if it cannot be queued
         try:
-            merge_service.merge_branches(
-                merge_request.source_branch,
-                merge_request.target_branch
-            )
-            
-            # Update merge request
-            merge_request.status = 'merged'
-            merge_request.reviewed_by = request.user
-            merge_request.reviewed_at = timezone.now()
-            merge_request.save()
-            
-            # Update source branch
-            merge_request.source_branch.status = 'merged'
-            merge_request.source_branch.merged_at = timezone.now()
-            merge_request.source_branch.save()
-            
-            # Log action
-            AuditLog.objects.create(
-                user=request.user,
-                action='APPROVE_MERGE_REQUEST',
-                entity_type='merge_request',
-                entity_id=merge_request.id,
-                details={'status': 'merged'}
-            )
-            
-            return Response({
-                'message': 'Merge request approved and merged successfully',
-                'merge_request': self.get_serializer(merge_request).data
-            })
-        except Exception as e:
+            task = perform_merge.delay(merge_request.id, request.user.id, previous_status)
+        except Exception:
+            MergeRequest.objects.filter(
+                pk=merge_request.pk, status='merging'
+            ).update(status=previous_status)
             return Response(
-                {'error': f'Merge failed: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Could not start the merge, please try again later'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
+        
+        return Response({
+            'message': 'Merge request approved, merge in progress',
+            'task_id': task.id,
+            'merge_request': self.get_serializer(merge_request).data
+        }, status=status.HTTP_202_ACCEPTED)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['get'], url_path='status')
+    def merge_status(self, request, pk=None):
+        """Get the current status of a merge request, e.g. while it is merging"""
+        merge_request = self.get_object()
+        return Response({
+            'id': merge_request.uuid_external,
+            'status': merge_request.status,
+            'reviewed_at': merge_request.reviewed_at
+        })
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, CanApproveMerges])
     def reject(self, request, pk=None):
         """Reject a merge request"""
         merge_request = self.get_object()
         
-        # Check permissions
-        if not self._can_approve(request.user):
+        # Update merge request unless a merge has started in the meantime
+        reviewed_at = timezone.now()
+        review_comment = request.data.get('comment', '')
+        rejected = MergeRequest.objects.filter(pk=merge_request.pk).exclude(
+            status__in=['merging', 'merged']
+        ).update(
+            status='rejected',
+            reviewed_by=request.user,
+            reviewed_at=reviewed_at,
+            review_comment=review_comment,
+            updated_at=reviewed_at
+        )
+        if not rejected:
             return Response(
-                {'error': 'You do not have permission to reject merge requests'},
-                status=status.HTTP_403_FORBIDDEN
+                {'error': 'Cannot reject a merge request that is merging or already merged'},
+                status=status.HTTP_409_CONFLICT
             )
-        
-        # Update merge request
         merge_request.status = 'rejected'
         merge_request.reviewed_by = request.user
-        merge_request.reviewed_at = timezone.now()
-        merge_request.review_comment = request.data.get('comment', '')
-        merge_request.save()
+        merge_request.reviewed_at = reviewed_at
+        merge_request.review_comment = review_comment
         
         # Log action
-        AuditLog.objects.create(
+        log_action(
             user=request.user,
             action='REJECT_MERGE_REQUEST',
             entity_type='merge_request',
-            entity_id=merge_request.id,
+            entity_id=merge_request.uuid_external,
             details={'status': 'rejected'}
         )
         
@@ -373,13 +435,6 @@ class MergeRequestViewSet(viewsets.ModelViewSet):
     def conflicts(self, request, pk=None):
         """Get conflicts for a merge request"""
         merge_request = self.get_object()
-        conflicts = merge_request.conflicts.all()
+        conflicts = MergeConflictSerializer.setup_eager_loading(merge_request.conflicts.all())
         serializer = MergeConflictSerializer(conflicts, many=True)
         return Response(serializer.data)
-    
-    def _can_approve(self, user):
-        """Check if user can approve merge requests"""
-        return user.is_superuser or \
-               (hasattr(user, 'profile') and 
-                hasattr(user.profile, 'role') and
-                user.profile.role in ['validator', 'admin'])
@@ -0,0 +1,69 @@
+"""
+Buffered audit logging for versioned editing.
+Audit entries recorded during a request (or a background task) are written
+in a single batch once the work is done. Entries recorded inside a
+transaction are only kept if that transaction commits.
+"""
+import threading
+from functools import partial
+from django.db import transaction
+from .models import AuditLog
+
+_state = threading.local()
+
+
+class AuditLogBuffer:
+    """Append-only list of audit entries written with one bulk insert"""
+    
+    def __init__(self):
+        self.entries = []
+    
+    def append(self, entry):
+        self.entries.append(entry)
+    
+    def flush(self):
+        """Write the buffered entries and empty the buffer"""
+        entries, self.entries = self.entries, []
+        if entries:
+            AuditLog.objects.bulk_create(entries, batch_size=500)
+
+
+def start_buffering():
+    """Start collecting audit entries for the current thread"""
+    _state.buffer = AuditLogBuffer()
+
+
+def flush():
+    """Write all buffered audit entries and stop buffering"""
+    buffer = getattr(_state, 'buffer', None)
+    _state.buffer = None
+    
+    if buffer is not None:
+        buffer.flush()
+
+
+def log_action(user, action, entity_type, entity_id, details=None, ip_address=None):
+    """
+    Record an audit entry.
+    The entry is buffered when called within a request handled by
+    AuditLogMiddleware (or between start_buffering() and flush()), and
+    written immediately otherwise. Inside a transaction, either happens
+    when the transaction commits and not at all if it rolls back.
+    """
+    entry = AuditLog(
+        user=user,
+        action=action,
+        entity_type=entity_type,
+        entity_id=entity_id,
+        details=details or {},
+        ip_address=ip_address
+    )
+    
+    # on_commit runs the callback right away outside of a transaction
+    buffer = getattr(_state, 'buffer', None)
+    if buffer is None:
+        transaction.on_commit(entry.save)
+    else:
+        transaction.on_commit(partial(buffer.append, entry))
+    
+    return entry
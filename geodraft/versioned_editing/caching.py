@@ -0,0 +1,53 @@
+"""
+Cache helpers for versioned editing.
+Data derived from a branch is cached under the branch's generation number,
+which is bumped whenever feature versions are written to the branch. Stale
+entries are therefore never read and simply age out of the cache.
+Generations are bumped by the web processes and by the Celery worker, so
+the default cache must be shared between them (Memcached, Redis); a
+per-process cache such as LocMemCache would serve stale data.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Warning, register
+import time
+
+GENERATION_KEY = 'versioned_editing:branch_generation:{}'
+
+
+def _new_generation():
+    # Time-based so that a generation lost to eviction is never reused
+    return time.time_ns()
+
+
+def get_branch_generation(branch_id):
+    """Get the current cache generation of a branch"""
+    key = GENERATION_KEY.format(branch_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _new_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_branch_generation(branch_id):
+    """Invalidate everything cached for a branch"""
+    key = GENERATION_KEY.format(branch_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_generation(), timeout=None)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when branch generations live in a per-process cache"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend.endswith('LocMemCache'):
+        return [Warning(
+            "The default cache is local to each process, so branch cache "
+            "invalidations are not seen by other processes.",
+            hint="Configure a shared cache (Memcached or Redis) as CACHES['default'].",
+            id='versioned_editing.W001',
+        )]
+    return []
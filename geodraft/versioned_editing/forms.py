@@ -9,6 +9,14 @@ from .models import EditBranch, MergeRequest, UserRole
 User = get_user_model()
 
 
+def layer_branch_choices(layer):
+    """Active branches of a layer, with only the columns their labels need"""
+    return EditBranch.objects.filter(
+        layer=layer,
+        status='active'
+    ).select_related('layer').only('id', 'name', 'layer', 'layer__name')
+
+
 class CreateBranchForm(forms.ModelForm):
     """Form for creating a new editing branch"""
     
@@ -32,6 +40,11 @@ class CreateBranchForm(forms.ModelForm):
                 'class': 'form-control'
             }),
         }
+    
+    def __init__(self, *args, layer=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if layer is not None:
+            self.fields['parent_branch'].queryset = layer_branch_choices(layer)
 
 
 class CreateMergeRequestForm(forms.ModelForm):
@@ -57,6 +70,12 @@ class CreateMergeRequestForm(forms.ModelForm):
                 'placeholder': 'Describe your changes'
             }),
         }
+    
+    def __init__(self, *args, layer=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if layer is not None:
+            self.fields['source_branch'].queryset = layer_branch_choices(layer)
+            self.fields['target_branch'].queryset = layer_branch_choices(layer)
 
 
 class AssignRoleForm(forms.Form):
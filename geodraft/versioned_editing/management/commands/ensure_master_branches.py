@@ -0,0 +1,60 @@
+"""
+Create missing master branches for vector layers, e.g. after a bulk import.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from geonode.layers.models import Dataset
+from versioned_editing.models import EditBranch
+
+
+class Command(BaseCommand):
+    help = "Create a master branch for every vector layer that does not have one"
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+    
+    def handle(self, *args, **options):
+        # Branches created before is_master existed: flag the root 'master'
+        # branch of each layer (the oldest one if there are several)
+        legacy_masters = EditBranch.objects.filter(
+            parent_branch__isnull=True, name='master'
+        ).exclude(
+            layer__edit_branches__is_master=True
+        ).values('layer').annotate(first_id=Min('id')).values('first_id')
+        flagged = EditBranch.objects.filter(id__in=legacy_masters).update(is_master=True)
+        
+        layers = Dataset.objects.filter(subtype='vector').exclude(
+            edit_branches__is_master=True
+        ).only('id', 'owner')
+        
+        # bulk_create skips save(), so is_master is set explicitly
+        branches = [
+            EditBranch(
+                name='master',
+                description='Master branch',
+                layer=layer,
+                created_by_id=layer.owner_id,
+                parent_branch=None,
+                status='active',
+                is_master=True
+            )
+            for layer in layers
+        ]
+        
+        # ignore_conflicts drops rows silently, so count what was inserted
+        masters_before = EditBranch.objects.filter(is_master=True).count()
+        EditBranch.objects.bulk_create(
+            branches,
+            batch_size=options['batch_size'],
+            ignore_conflicts=True
+        )
+        created = EditBranch.objects.filter(is_master=True).count() - masters_before
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"Flagged {flagged} existing master branches, created {created} master branches"
+        ))
+        if created < len(branches):
+            self.stdout.write(self.style.WARNING(
+                f"{len(branches) - created} layers still have no master branch "
+                f"(a conflicting branch already exists)"
+            ))
@@ -0,0 +1,27 @@
+"""
+Rebuild the conflict counters of merge requests from their conflict rows,
+e.g. for merge requests created before the counters existed.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from versioned_editing.models import MergeConflict, MergeRequest
+
+
+def _conflict_count(**filters):
+    """Correlated COUNT of a merge request's conflicts"""
+    counts = MergeConflict.objects.filter(
+        merge_request=OuterRef('pk'), **filters
+    ).order_by().values('merge_request').annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = "Recompute conflicts_count and unresolved_conflicts_count of all merge requests"
+    
+    def handle(self, *args, **options):
+        updated = MergeRequest.objects.update(
+            conflicts_count=_conflict_count(),
+            unresolved_conflicts_count=_conflict_count(resolved=False)
+        )
+        self.stdout.write(self.style.SUCCESS(f"Recounted conflicts of {updated} merge requests"))
@@ -0,0 +1,29 @@
+"""
+Release merge requests stuck in the 'merging' status, e.g. after their
+background merge task was lost.
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from versioned_editing.models import MergeRequest
+
+
+class Command(BaseCommand):
+    help = "Set merge requests that have been merging for too long back to pending"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=60,
+            help="Minutes since the merge was started"
+        )
+    
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(minutes=options['older_than'])
+        
+        # A running merge holds a lock on its row and commits 'merged' first
+        reset = MergeRequest.objects.filter(
+            status='merging', updated_at__lt=cutoff
+        ).update(status='pending', updated_at=now)
+        
+        self.stdout.write(self.style.SUCCESS(f"Reset {reset} stale merge requests to pending"))
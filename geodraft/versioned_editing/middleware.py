@@ -0,0 +1,27 @@
+"""
+Middleware for versioned editing.
+"""
+import logging
+from . import audit
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLogMiddleware:
+    """
+    Buffers audit entries for the duration of a request and writes them
+    with a single bulk insert once the response is ready.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        audit.start_buffering()
+        try:
+            return self.get_response(request)
+        finally:
+            try:
+                audit.flush()
+            except Exception as e:
+                logger.error(f"Failed to write audit log entries: {e}")
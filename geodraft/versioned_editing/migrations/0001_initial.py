@@ -0,0 +1,201 @@
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+    
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('layers', '__first__'),
+        ('groups', '__first__'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='EditBranch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(help_text='Branch name', max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('merged', 'Merged'), ('closed', 'Closed'), ('deleted', 'Deleted')], default='active', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('merged_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_branches', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(blank=True, help_text='GeoNode group this branch belongs to for permission management', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='edit_branches', to='groups.groupprofile')),
+                ('layer', models.ForeignKey(help_text='GeoNode layer this branch belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='edit_branches', to='layers.dataset')),
+                ('parent_branch', models.ForeignKey(blank=True, help_text="Parent branch (typically 'master')", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='child_branches', to='versioned_editing.editbranch')),
+            ],
+            options={
+                'db_table': 'versioned_editing_branch',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FeatureVersion',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('feature_id', models.UUIDField(help_text='Identifies the feature across versions')),
+                ('version', models.IntegerField(default=1, help_text='Version number')),
+                ('geometry', django.contrib.gis.db.models.fields.GeometryField(help_text='Feature geometry in WGS84', srid=4326)),
+                ('properties', models.JSONField(default=dict, help_text='Feature properties/attributes')),
+                ('operation', models.CharField(choices=[('CREATE', 'Create'), ('UPDATE', 'Update'), ('DELETE', 'Delete'), ('MERGE', 'Merge')], max_length=20)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.TextField(blank=True, help_text='Edit comment', null=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feature_versions', to='versioned_editing.editbranch')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'versioned_editing_feature_version',
+                'ordering': ['feature_id', '-version'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MergeRequest',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending Review'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('merged', 'Merged'), ('conflicts', 'Has Conflicts')], default='pending', max_length=20)),
+                ('review_comment', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reviewed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_merge_requests', to=settings.AUTH_USER_MODEL)),
+                ('reviewed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviewed_merge_requests', to=settings.AUTH_USER_MODEL)),
+                ('source_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merge_requests_as_source', to='versioned_editing.editbranch')),
+                ('target_branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='merge_requests_as_target', to='versioned_editing.editbranch')),
+            ],
+            options={
+                'db_table': 'versioned_editing_merge_request',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MergeConflict',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('feature_id', models.UUIDField(help_text='Feature with conflict')),
+                ('conflict_type', models.CharField(choices=[('GEOMETRY', 'Geometry Conflict'), ('PROPERTIES', 'Properties Conflict'), ('BOTH', 'Geometry and Properties Conflict'), ('DELETE', 'Delete Conflict')], max_length=20)),
+                ('resolved', models.BooleanField(default=False)),
+                ('resolution_strategy', models.CharField(blank=True, choices=[('SOURCE', 'Use Source Version'), ('TARGET', 'Use Target Version'), ('MANUAL', 'Manual Resolution')], max_length=20, null=True)),
+                ('resolved_geometry', django.contrib.gis.db.models.fields.GeometryField(blank=True, null=True, srid=4326)),
+                ('resolved_properties', models.JSONField(blank=True, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('merge_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conflicts', to='versioned_editing.mergerequest')),
+                ('resolved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('source_version', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conflicts_as_source', to='versioned_editing.featureversion')),
+                ('target_version', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conflicts_as_target', to='versioned_editing.featureversion')),
+            ],
+            options={
+                'db_table': 'versioned_editing_conflict',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditLog',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('action', models.CharField(choices=[('CREATE_BRANCH', 'Create Branch'), ('DELETE_BRANCH', 'Delete Branch'), ('CREATE_FEATURE', 'Create Feature'), ('UPDATE_FEATURE', 'Update Feature'), ('DELETE_FEATURE', 'Delete Feature'), ('CREATE_MERGE_REQUEST', 'Create Merge Request'), ('APPROVE_MERGE_REQUEST', 'Approve Merge Request'), ('REJECT_MERGE_REQUEST', 'Reject Merge Request'), ('RESOLVE_CONFLICT', 'Resolve Conflict')], max_length=50)),
+                ('entity_type', models.CharField(max_length=50)),
+                ('entity_id', models.UUIDField()),
+                ('details', models.JSONField(default=dict)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'versioned_editing_audit_log',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserRole',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('role', models.CharField(choices=[('admin', 'Administrator'), ('validator', 'Validator'), ('editor', 'Editor')], max_length=20)),
+                ('can_approve_merges', models.BooleanField(default=False, help_text='Can approve merge requests (automatically True for validators and admins)')),
+                ('can_manage_branches', models.BooleanField(default=True, help_text='Can create and delete branches')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('group', models.ForeignKey(help_text='GeoNode group this role applies to', on_delete=django.db.models.deletion.CASCADE, related_name='versioned_editing_roles', to='groups.groupprofile')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versioned_editing_roles', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'versioned_editing_user_role',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userrole',
+            index=models.Index(fields=['user', 'role'], name='versioned_e_user_id_2ae291_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userrole',
+            index=models.Index(fields=['group', 'role'], name='versioned_e_group_i_edbd48_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='userrole',
+            unique_together={('user', 'group', 'role')},
+        ),
+        migrations.AddIndex(
+            model_name='mergerequest',
+            index=models.Index(fields=['status', '-created_at'], name='versioned_e_status_805e64_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mergerequest',
+            index=models.Index(fields=['source_branch', 'status'], name='versioned_e_source__06d25a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mergerequest',
+            index=models.Index(fields=['created_by', 'status'], name='versioned_e_created_101cb9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mergeconflict',
+            index=models.Index(fields=['merge_request', 'resolved'], name='versioned_e_merge_r_a687e9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='featureversion',
+            index=models.Index(fields=['branch', 'feature_id'], name='versioned_e_branch__e88c85_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='featureversion',
+            index=models.Index(fields=['branch', 'is_deleted'], name='versioned_e_branch__f0cd66_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='featureversion',
+            index=models.Index(fields=['feature_id', 'version'], name='versioned_e_feature_a00be4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='editbranch',
+            index=models.Index(fields=['layer', 'status'], name='versioned_e_layer_i_f24630_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='editbranch',
+            index=models.Index(fields=['created_by', 'status'], name='versioned_e_created_a152d4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='editbranch',
+            index=models.Index(fields=['group', 'status'], name='versioned_e_group_i_9e1d48_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='editbranch',
+            unique_together={('layer', 'name', 'created_by')},
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', '-created_at'], name='versioned_e_user_id_ca606a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['entity_type', 'entity_id'], name='versioned_e_entity__0ded4b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-created_at'], name='versioned_e_created_a87b21_idx'),
+        ),
+    ]
@@ -0,0 +1,137 @@
+# Replaces the UUID primary keys with bigint ones. The old UUIDs are kept
+# as uuid_external, which the API exposes, so external references (URLs,
+# audit entries) stay valid. Foreign keys are remapped in place; the
+# generated AlterField operations cannot cast uuid to bigint.
+import uuid
+from django.db import migrations, models
+
+BRANCH = 'versioned_editing_branch'
+FEATURE_VERSION = 'versioned_editing_feature_version'
+MERGE_REQUEST = 'versioned_editing_merge_request'
+CONFLICT = 'versioned_editing_conflict'
+USER_ROLE = 'versioned_editing_user_role'
+AUDIT_LOG = 'versioned_editing_audit_log'
+
+# (table, column, referenced table, foreign key constraint name)
+FOREIGN_KEYS = [
+    (FEATURE_VERSION, 'branch_id', BRANCH, 'versioned_editing_fe_branch_id_fa6724be_fk_versioned'),
+    (MERGE_REQUEST, 'source_branch_id', BRANCH, 'versioned_editing_me_source_branch_id_2eb23f11_fk_versioned'),
+    (MERGE_REQUEST, 'target_branch_id', BRANCH, 'versioned_editing_me_target_branch_id_4c023874_fk_versioned'),
+    (CONFLICT, 'merge_request_id', MERGE_REQUEST, 'versioned_editing_co_merge_request_id_0b2531f1_fk_versioned'),
+    (CONFLICT, 'source_version_id', FEATURE_VERSION, 'versioned_editing_co_source_version_id_4b440473_fk_versioned'),
+    (CONFLICT, 'target_version_id', FEATURE_VERSION, 'versioned_editing_co_target_version_id_1bc4a0e9_fk_versioned'),
+]
+
+
+def _drop_foreign_keys_sql():
+    """Drop every foreign key pointing at a table whose key changes"""
+    referenced = ', '.join(f"'{table}'::regclass" for table in (BRANCH, FEATURE_VERSION, MERGE_REQUEST))
+    return [f"""
+        DO $$
+        DECLARE fk record;
+        BEGIN
+            FOR fk IN
+                SELECT conrelid::regclass AS tbl, conname FROM pg_constraint
+                WHERE contype = 'f' AND confrelid IN ({referenced})
+            LOOP
+                EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.tbl, fk.conname);
+            END LOOP;
+        END $$
+    """]
+
+
+def _swap_primary_key_sql(table):
+    """Keep the UUID as uuid_external and add a bigserial primary key"""
+    return [
+        f"ALTER TABLE {table} RENAME COLUMN id TO uuid_external",
+        f"ALTER TABLE {table} DROP CONSTRAINT {table}_pkey",
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_uuid_external_key UNIQUE (uuid_external)",
+        f"ALTER TABLE {table} ADD COLUMN id bigserial PRIMARY KEY",
+    ]
+
+
+def _lookup_function_sql(table):
+    """uuid_external -> id lookup usable in ALTER COLUMN ... USING"""
+    return [
+        f"CREATE FUNCTION pg_temp.{table}_id(uuid) RETURNS bigint LANGUAGE sql STABLE "
+        f"AS 'SELECT id FROM {table} WHERE uuid_external = $1'"
+    ]
+
+
+def _remap_foreign_key_sql(table, column, referenced, constraint):
+    """Convert a UUID foreign key column to the referenced row's bigint id"""
+    return [
+        f"ALTER TABLE {table} ALTER COLUMN {column} TYPE bigint USING pg_temp.{referenced}_id({column})",
+        f"ALTER TABLE {table} ADD CONSTRAINT {constraint} "
+        f"FOREIGN KEY ({column}) REFERENCES {referenced} (id) DEFERRABLE INITIALLY DEFERRED",
+    ]
+
+
+def _forward_sql():
+    statements = _drop_foreign_keys_sql()
+    for table in (USER_ROLE, BRANCH, FEATURE_VERSION, MERGE_REQUEST, CONFLICT):
+        statements += _swap_primary_key_sql(table)
+    for table in (BRANCH, FEATURE_VERSION, MERGE_REQUEST):
+        statements += _lookup_function_sql(table)
+    for foreign_key in FOREIGN_KEYS:
+        statements += _remap_foreign_key_sql(*foreign_key)
+    
+    # The self-reference cannot be remapped while its own table is rewritten
+    statements += [
+        f"ALTER TABLE {BRANCH} ADD COLUMN parent_branch_bigint bigint",
+        f"UPDATE {BRANCH} AS child SET parent_branch_bigint = parent.id "
+        f"FROM {BRANCH} AS parent WHERE parent.uuid_external = child.parent_branch_id",
+        f"ALTER TABLE {BRANCH} DROP COLUMN parent_branch_id",
+        f"ALTER TABLE {BRANCH} RENAME COLUMN parent_branch_bigint TO parent_branch_id",
+        f"CREATE INDEX versioned_editing_branch_parent_branch_id_48237e64 ON {BRANCH} (parent_branch_id)",
+        f"ALTER TABLE {BRANCH} ADD CONSTRAINT versioned_editing_br_parent_branch_id_48237e64_fk_versioned "
+        f"FOREIGN KEY (parent_branch_id) REFERENCES {BRANCH} (id) DEFERRABLE INITIALLY DEFERRED",
+    ]
+    
+    # Audit entries reference entities by UUID and are never referenced
+    statements += [
+        f"ALTER TABLE {AUDIT_LOG} DROP CONSTRAINT {AUDIT_LOG}_pkey",
+        f"ALTER TABLE {AUDIT_LOG} DROP COLUMN id",
+        f"ALTER TABLE {AUDIT_LOG} ADD COLUMN id bigserial PRIMARY KEY",
+    ]
+    
+    for table in (BRANCH, FEATURE_VERSION, MERGE_REQUEST):
+        statements.append(f"DROP FUNCTION pg_temp.{table}_id(uuid)")
+    return statements
+
+
+def _state_operations():
+    operations = []
+    for model_name in ['userrole', 'editbranch', 'featureversion', 'mergerequest', 'mergeconflict']:
+        operations += [
+            migrations.AlterField(
+                model_name=model_name,
+                name='id',
+                field=models.BigAutoField(primary_key=True, serialize=False),
+            ),
+            migrations.AddField(
+                model_name=model_name,
+                name='uuid_external',
+                field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+            ),
+        ]
+    operations.append(migrations.AlterField(
+        model_name='auditlog',
+        name='id',
+        field=models.BigAutoField(primary_key=True, serialize=False),
+    ))
+    return operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('versioned_editing', '0001_initial'),
+    ]
+    
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunSQL(_forward_sql())],
+            state_operations=_state_operations(),
+        ),
+    ]
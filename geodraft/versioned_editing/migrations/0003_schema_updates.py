@@ -0,0 +1,224 @@
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+# Keep the highest role of users holding several roles in the same group
+DEDUPLICATE_ROLES_SQL = """
+    DELETE FROM versioned_editing_user_role WHERE id IN (
+        SELECT id FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY user_id, group_id
+                ORDER BY CASE role WHEN 'admin' THEN 0 WHEN 'validator' THEN 1 ELSE 2 END, id
+            ) AS position
+            FROM versioned_editing_user_role
+        ) AS ranked
+        WHERE position > 1
+    )
+"""
+
+APPROVE_FLAG_SQL = """
+    UPDATE versioned_editing_user_role SET can_approve_merges = TRUE
+    WHERE role <> 'editor' AND NOT can_approve_merges
+"""
+
+# The oldest root 'master' branch of each layer becomes its master
+MASTER_BRANCHES_SQL = """
+    UPDATE versioned_editing_branch SET is_master = TRUE WHERE id IN (
+        SELECT DISTINCT ON (layer_id) id FROM versioned_editing_branch
+        WHERE parent_branch_id IS NULL AND name = 'master'
+        ORDER BY layer_id, created_at, id
+    )
+"""
+
+GEOMETRY_HASH_SQL = """
+    UPDATE versioned_editing_feature_version SET geometry_hash = md5(ST_AsEWKB(geometry))
+    WHERE geometry IS NOT NULL
+"""
+
+CONFLICT_COUNTS_SQL = """
+    UPDATE versioned_editing_merge_request AS mr SET
+        conflicts_count = counts.total,
+        unresolved_conflicts_count = counts.unresolved
+    FROM (
+        SELECT merge_request_id, count(*) AS total, count(*) FILTER (WHERE NOT resolved) AS unresolved
+        FROM versioned_editing_conflict GROUP BY merge_request_id
+    ) AS counts
+    WHERE counts.merge_request_id = mr.id
+"""
+
+
+def link_resolved_versions(apps, schema_editor):
+    """
+    Point resolved conflicts at the version they resolved to. Manual
+    resolutions become a MERGE version on the source branch, as
+    ConflictResolver now records them.
+    """
+    MergeConflict = apps.get_model('versioned_editing', 'MergeConflict')
+    FeatureVersion = apps.get_model('versioned_editing', 'FeatureVersion')
+    
+    resolved = MergeConflict.objects.filter(resolved=True)
+    resolved.filter(resolution_strategy='SOURCE').update(resolved_version_id=F('source_version_id'))
+    resolved.filter(resolution_strategy='TARGET').update(resolved_version_id=F('target_version_id'))
+    
+    manual = resolved.filter(
+        resolution_strategy='MANUAL', resolved_geometry__isnull=False
+    ).select_related('source_version')
+    for conflict in manual:
+        source_version = conflict.source_version
+        latest = FeatureVersion.objects.filter(
+            branch_id=source_version.branch_id,
+            feature_id=conflict.feature_id
+        ).aggregate(latest=Max('version'))['latest']
+        
+        conflict.resolved_version = FeatureVersion.objects.create(
+            branch_id=source_version.branch_id,
+            feature_id=conflict.feature_id,
+            version=(latest or 0) + 1,
+            geometry=conflict.resolved_geometry,
+            properties=conflict.resolved_properties or {},
+            operation='MERGE',
+            previous_version=source_version,
+            created_by_id=conflict.resolved_by_id or source_version.created_by_id,
+            comment="Manual conflict resolution"
+        )
+        conflict.save(update_fields=['resolved_version'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('versioned_editing', '0002_bigint_ids'),
+    ]
+    
+    operations = [
+        # UserRole: one role per user and group
+        migrations.RunSQL(DEDUPLICATE_ROLES_SQL, migrations.RunSQL.noop),
+        migrations.AlterUniqueTogether(
+            name='userrole',
+            unique_together={('user', 'group')},
+        ),
+        migrations.RunSQL(APPROVE_FLAG_SQL, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='userrole',
+            constraint=models.CheckConstraint(check=models.Q(role='editor') | models.Q(can_approve_merges=True), name='ve_approve_flag_consistent'),
+        ),
+        
+        # EditBranch
+        migrations.AddField(
+            model_name='editbranch',
+            name='is_master',
+            field=models.BooleanField(default=False, editable=False, help_text="Root branch named 'master'; maintained in save()"),
+        ),
+        migrations.RunSQL(MASTER_BRANCHES_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='editbranch',
+            index=models.Index(condition=models.Q(status='active'), fields=['layer'], name='ve_branch_active'),
+        ),
+        migrations.AddConstraint(
+            model_name='editbranch',
+            constraint=models.UniqueConstraint(condition=models.Q(is_master=True), fields=('layer',), name='uniq_master_per_layer'),
+        ),
+        
+        # FeatureVersion
+        migrations.AlterModelOptions(
+            name='featureversion',
+            options={},
+        ),
+        migrations.AlterField(
+            model_name='featureversion',
+            name='geometry',
+            field=django.contrib.gis.db.models.fields.GeometryField(blank=True, help_text='Feature geometry in WGS84 (SP-GiST index in Meta)', null=True, spatial_index=False, srid=4326),
+        ),
+        # AlterField does not drop the GiST index when spatial_index is turned off
+        migrations.RunSQL(
+            'DROP INDEX IF EXISTS versioned_editing_feature_version_geometry_id',
+            migrations.RunSQL.noop
+        ),
+        migrations.AddField(
+            model_name='featureversion',
+            name='geometry_hash',
+            field=models.CharField(blank=True, editable=False, help_text="MD5 of the geometry's EWKB; maintained in save()", max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='featureversion',
+            name='previous_version',
+            field=models.ForeignKey(blank=True, help_text='Version this one supersedes (used by delete tombstones)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='next_versions', to='versioned_editing.featureversion'),
+        ),
+        migrations.RemoveIndex(
+            model_name='featureversion',
+            name='versioned_e_branch__e88c85_idx',
+        ),
+        migrations.AddIndex(
+            model_name='featureversion',
+            index=models.Index(fields=['branch', 'feature_id', '-version'], name='fv_branch_feat_ver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='featureversion',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['branch'], name='fv_branch_active'),
+        ),
+        migrations.AddIndex(
+            model_name='featureversion',
+            index=models.Index(fields=['geometry_hash'], name='versioned_e_geometr_a97f52_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='featureversion',
+            index=django.contrib.postgres.indexes.SpGistIndex(fields=['geometry'], name='fv_geom_spgist'),
+        ),
+        
+        # MergeRequest
+        migrations.AlterField(
+            model_name='mergerequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending Review'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('merging', 'Merging'), ('merged', 'Merged'), ('conflicts', 'Has Conflicts')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='mergerequest',
+            name='conflicts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mergerequest',
+            name='unresolved_conflicts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(CONFLICT_COUNTS_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='mergerequest',
+            index=models.Index(condition=models.Q(status='pending'), fields=['-created_at'], name='ve_mr_pending'),
+        ),
+        
+        # MergeConflict: reference the resolving version instead of copying it
+        migrations.AddField(
+            model_name='mergeconflict',
+            name='resolved_version',
+            field=models.ForeignKey(blank=True, help_text='Version chosen (or created) to resolve the conflict', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resolved_conflicts', to='versioned_editing.featureversion'),
+        ),
+        migrations.RunPython(link_resolved_versions, migrations.RunPython.noop),
+        # Check the deferred foreign keys now so the tables can be altered below
+        migrations.RunSQL('SET CONSTRAINTS ALL IMMEDIATE', migrations.RunSQL.noop),
+        migrations.RemoveField(
+            model_name='mergeconflict',
+            name='resolved_geometry',
+        ),
+        migrations.RemoveField(
+            model_name='mergeconflict',
+            name='resolved_properties',
+        ),
+        migrations.AddIndex(
+            model_name='mergeconflict',
+            index=models.Index(condition=models.Q(resolved=False), fields=['merge_request'], name='ve_conflict_unresolved'),
+        ),
+        
+        # Includes the versions created for manual resolutions above
+        migrations.RunSQL(GEOMETRY_HASH_SQL, migrations.RunSQL.noop),
+        
+        # AuditLog
+        migrations.AlterField(
+            model_name='auditlog',
+            name='entity_id',
+            field=models.UUIDField(help_text='External UUID of the entity'),
+        ),
+    ]
@@ -3,12 +3,16 @@ Models for versioned editing system.
 Integrates with GeoNode layers for collaborative editing.
 Supports role-based permissions with Admin, Validator, and Editor roles.
 """
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Max, Prefetch, Q
 from django.contrib.auth import get_user_model
 from django.contrib.gis.db import models as gis_models
+from django.contrib.postgres.indexes import SpGistIndex
 from django.utils import timezone
 from geonode.layers.models import Dataset
 from geonode.groups.models import GroupProfile
+from .caching import bump_branch_generation
+import hashlib
 import uuid
 
 User = get_user_model()
@@ -17,7 +21,8 @@ User = get_user_model()
 class UserRole(models.Model):
     """
     Defines user roles within groups for versioned editing.
-    A user can have different roles in different groups.
+    A user has at most one role per group, and can have different roles
+    in different groups.
     
     Roles:
     - admin: Full system access, manages data library, users, groups, and permissions
@@ -30,7 +35,8 @@ class UserRole(models.Model):
         ('editor', 'Editor'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.BigAutoField(primary_key=True)
+    uuid_external = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='versioned_editing_roles')
     group = models.ForeignKey(
         GroupProfile, 
@@ -55,20 +61,45 @@ class UserRole(models.Model):
     
     class Meta:
         db_table = 'versioned_editing_user_role'
-        unique_together = [['user', 'group', 'role']]
+        # One role per user and group; also indexes (user, group) lookups
+        unique_together = [['user', 'group']]
         indexes = [
             models.Index(fields=['user', 'role']),
             models.Index(fields=['group', 'role']),
         ]
+        constraints = [
+            # Validators and admins can always approve merges
+            models.CheckConstraint(
+                check=Q(role='editor') | Q(can_approve_merges=True),
+                name='ve_approve_flag_consistent'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.role} in {self.group.title}"
     
-    def save(self, *args, **kwargs):
-        # Auto-enable merge approval for validators and admins
+    def clean(self):
+        # Auto-enable merge approval for validators and admins in forms
         if self.role in ['validator', 'admin']:
             self.can_approve_merges = True
-        super().save(*args, **kwargs)
+
+
+class EditBranchQuerySet(models.QuerySet):
+    """QuerySet for EditBranch with prefetch helpers"""
+    
+    def with_active_versions(self):
+        """
+        Prefetch the non-deleted feature versions of every branch into
+        ``active_versions``, newest version of each feature first.
+        Runs one extra query for the whole queryset.
+        """
+        return self.prefetch_related(Prefetch(
+            'feature_versions',
+            queryset=FeatureVersion.objects.filter(
+                is_deleted=False
+            ).order_by('feature_id', '-version'),
+            to_attr='active_versions'
+        ))
 
 
 class EditBranch(models.Model):
@@ -84,7 +115,8 @@ class EditBranch(models.Model):
         ('deleted', 'Deleted'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.BigAutoField(primary_key=True)
+    uuid_external = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     name = models.CharField(max_length=255, help_text="Branch name")
     description = models.TextField(blank=True, null=True)
     
@@ -119,12 +151,19 @@ class EditBranch(models.Model):
     # User and status
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_branches')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    is_master = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Root branch named 'master'; maintained in save()"
+    )
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     merged_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = EditBranchQuerySet.as_manager()
+
     class Meta:
         db_table = 'versioned_editing_branch'
         unique_together = [['layer', 'name', 'created_by']]
@@ -133,14 +172,30 @@ class EditBranch(models.Model):
             models.Index(fields=['layer', 'status']),
             models.Index(fields=['created_by', 'status']),
             models.Index(fields=['group', 'status']),
+            models.Index(
+                fields=['layer'],
+                condition=Q(status='active'),
+                name='ve_branch_active'
+            ),
+        ]
+        constraints = [
+            # Also serves master branch lookups by layer
+            models.UniqueConstraint(
+                fields=['layer'],
+                condition=Q(is_master=True),
+                name='uniq_master_per_layer'
+            ),
         ]
 
     def __str__(self):
         return f"{self.layer.name} - {self.name}"
 
-    def is_master(self):
-        """Check if this is the master branch"""
-        return self.parent_branch is None and self.name == 'master'
+    def save(self, *args, **kwargs):
+        self.is_master = self.parent_branch_id is None and self.name == 'master'
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'name', 'parent_branch'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'is_master'}
+        super().save(*args, **kwargs)
     
     def can_user_edit(self, user):
         """Check if user can edit this branch"""
@@ -149,15 +204,42 @@ class EditBranch(models.Model):
             return True
         
         # Check if user has editor role in the branch's group
-        if self.group:
+        if self.group_id:
             return UserRole.objects.filter(
                 user=user,
-                group=self.group,
+                group_id=self.group_id,
                 role__in=['editor', 'validator', 'admin']
             ).exists()
         
         # If no group, check if user is the creator
-        return self.created_by == user
+        return self.created_by_id == user.id
+
+
+class FeatureVersionQuerySet(models.QuerySet):
+    """QuerySet for FeatureVersion with write helpers"""
+    
+    def bulk_create_versions(self, branch, rows, batch_size=1000):
+        """
+        Insert many feature versions into a branch with batched INSERTs.
+        Each row is a dict of FeatureVersion field values.
+        post_save is not sent for bulk inserts, so the branch cache is
+        invalidated here, once the inserts are committed.
+        """
+        versions = [self.model(branch=branch, **row) for row in rows]
+        for version in versions:
+            version.update_geometry_hash()
+        versions = self.bulk_create(versions, batch_size=batch_size)
+        branch_id = branch.id
+        transaction.on_commit(lambda: bump_branch_generation(branch_id))
+        return versions
+    
+    def next_version(self, branch_id, feature_id):
+        """Next version number of a feature in a branch (a scalar MAX query)"""
+        latest = self.filter(
+            branch_id=branch_id,
+            feature_id=feature_id
+        ).aggregate(latest=Max('version'))['latest']
+        return (latest or 0) + 1
 
 
 class FeatureVersion(models.Model):
@@ -172,17 +254,28 @@ class FeatureVersion(models.Model):
         ('MERGE', 'Merge'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.BigAutoField(primary_key=True)
+    uuid_external = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     
     # Branch and feature identification
     branch = models.ForeignKey(EditBranch, on_delete=models.CASCADE, related_name='feature_versions')
     feature_id = models.UUIDField(help_text="Identifies the feature across versions")
     version = models.IntegerField(default=1, help_text="Version number")
     
-    # Spatial data
+    # Spatial data (empty on delete tombstones)
     geometry = gis_models.GeometryField(
         srid=4326,
-        help_text="Feature geometry in WGS84"
+        null=True,
+        blank=True,
+        spatial_index=False,
+        help_text="Feature geometry in WGS84 (SP-GiST index in Meta)"
+    )
+    geometry_hash = models.CharField(
+        max_length=32,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="MD5 of the geometry's EWKB; maintained in save()"
     )
     properties = models.JSONField(
         default=dict,
@@ -192,24 +285,51 @@ class FeatureVersion(models.Model):
     # Operation and status
     operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
     is_deleted = models.BooleanField(default=False)
+    previous_version = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='next_versions',
+        help_text="Version this one supersedes (used by delete tombstones)"
+    )
     
     # Metadata
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     comment = models.TextField(blank=True, null=True, help_text="Edit comment")
 
+    objects = FeatureVersionQuerySet.as_manager()
+
     class Meta:
         db_table = 'versioned_editing_feature_version'
-        ordering = ['feature_id', '-version']
         indexes = [
-            models.Index(fields=['branch', 'feature_id']),
+            models.Index(fields=['branch', 'feature_id', '-version'], name='fv_branch_feat_ver_idx'),
             models.Index(fields=['branch', 'is_deleted']),
             models.Index(fields=['feature_id', 'version']),
+            models.Index(
+                fields=['branch'],
+                condition=Q(is_deleted=False),
+                name='fv_branch_active'
+            ),
+            models.Index(fields=['geometry_hash']),
+            SpGistIndex(fields=['geometry'], name='fv_geom_spgist'),
         ]
 
     def __str__(self):
         return f"Feature {self.feature_id} v{self.version} ({self.operation})"
 
+    def save(self, *args, **kwargs):
+        self.update_geometry_hash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'geometry' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'geometry_hash'}
+        super().save(*args, **kwargs)
+
+    def update_geometry_hash(self):
+        """Recompute geometry_hash from the current geometry"""
+        self.geometry_hash = hashlib.md5(self.geometry.ewkb).hexdigest() if self.geometry else None
+
 
 class MergeRequest(models.Model):
     """
@@ -220,11 +340,13 @@ class MergeRequest(models.Model):
         ('pending', 'Pending Review'),
         ('approved', 'Approved'),
         ('rejected', 'Rejected'),
+        ('merging', 'Merging'),
         ('merged', 'Merged'),
         ('conflicts', 'Has Conflicts'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.BigAutoField(primary_key=True)
+    uuid_external = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     
     # Branches
     source_branch = models.ForeignKey(
@@ -260,6 +382,11 @@ class MergeRequest(models.Model):
     # Review details
     review_comment = models.TextField(blank=True, null=True)
     
+    # Conflict counters for display, maintained when conflicts are created and
+    # resolved; `manage.py recount_merge_conflicts` rebuilds them
+    conflicts_count = models.PositiveIntegerField(default=0)
+    unresolved_conflicts_count = models.PositiveIntegerField(default=0)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -272,6 +399,11 @@ class MergeRequest(models.Model):
             models.Index(fields=['status', '-created_at']),
             models.Index(fields=['source_branch', 'status']),
             models.Index(fields=['created_by', 'status']),
+            models.Index(
+                fields=['-created_at'],
+                condition=Q(status='pending'),
+                name='ve_mr_pending'
+            ),
         ]
 
     def __str__(self):
@@ -284,10 +416,10 @@ class MergeRequest(models.Model):
             return True
         
         # Check if user has validator or admin role in the target branch's group
-        if self.target_branch.group:
+        if self.target_branch.group_id:
             return UserRole.objects.filter(
                 user=user,
-                group=self.target_branch.group,
+                group_id=self.target_branch.group_id,
                 role__in=['validator', 'admin'],
                 can_approve_merges=True
             ).exists()
@@ -295,17 +427,15 @@ class MergeRequest(models.Model):
         return False
     
     def get_validators(self):
-        """Get all users who can validate this merge request"""
-        if not self.target_branch.group:
+        """Get all users who can validate this merge request (as a QuerySet)"""
+        if not self.target_branch.group_id:
             return User.objects.filter(is_superuser=True)
         
-        validator_roles = UserRole.objects.filter(
-            group=self.target_branch.group,
-            role__in=['validator', 'admin'],
-            can_approve_merges=True
-        ).select_related('user')
-        
-        return [role.user for role in validator_roles]
+        return User.objects.filter(
+            versioned_editing_roles__group_id=self.target_branch.group_id,
+            versioned_editing_roles__role__in=['validator', 'admin'],
+            versioned_editing_roles__can_approve_merges=True
+        ).distinct()
 
 
 class MergeConflict(models.Model):
@@ -325,7 +455,8 @@ class MergeConflict(models.Model):
         ('MANUAL', 'Manual Resolution'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.BigAutoField(primary_key=True)
+    uuid_external = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     
     merge_request = models.ForeignKey(
         MergeRequest,
@@ -358,8 +489,14 @@ class MergeConflict(models.Model):
         null=True,
         blank=True
     )
-    resolved_geometry = gis_models.GeometryField(srid=4326, null=True, blank=True)
-    resolved_properties = models.JSONField(null=True, blank=True)
+    resolved_version = models.ForeignKey(
+        FeatureVersion,
+        on_delete=models.SET_NULL,
+        related_name='resolved_conflicts',
+        null=True,
+        blank=True,
+        help_text="Version chosen (or created) to resolve the conflict"
+    )
     resolved_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -372,6 +509,11 @@ class MergeConflict(models.Model):
         db_table = 'versioned_editing_conflict'
         indexes = [
             models.Index(fields=['merge_request', 'resolved']),
+            models.Index(
+                fields=['merge_request'],
+                condition=Q(resolved=False),
+                name='ve_conflict_unresolved'
+            ),
         ]
 
     def __str__(self):
@@ -394,14 +536,14 @@ class AuditLog(models.Model):
         ('RESOLVE_CONFLICT', 'Resolve Conflict'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.BigAutoField(primary_key=True)
     
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=50, choices=ACTION_CHOICES)
     
     # Entity references
     entity_type = models.CharField(max_length=50)
-    entity_id = models.UUIDField()
+    entity_id = models.UUIDField(help_text="External UUID of the entity")
     
     # Details
     details = models.JSONField(default=dict)
@@ -0,0 +1,101 @@
+"""
+Pagination classes for the versioned editing API.
+"""
+import math
+from collections import OrderedDict
+from django.db import connections
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Cursor pagination for append-only tables (feature versions, audit log).
+    Pages are fetched by position, so no COUNT(*) is ever issued.
+    """
+    ordering = '-created_at'
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """
+    Page number pagination that avoids COUNT(*) when a large table is
+    browsed without any filter.
+    The planner's row estimate is only reported as ``count``; pages are
+    fetched with one extra row to know whether a next page exists, so an
+    outdated estimate never hides or invents pages. ``page=last`` still
+    works, at the cost of an exact count.
+    """
+    # Below this many rows the exact count is cheap enough
+    ESTIMATE_THRESHOLD = 10000
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        
+        count = None
+        page_number = request.query_params.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            # The last page can only be located with an exact count
+            count = queryset.count()
+            page_number = max(math.ceil(count / page_size), 1)
+        try:
+            page_number = int(page_number)
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message='Invalid page.'))
+        if page_number < 1:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message='Invalid page.'))
+        
+        offset = (page_number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        if not rows and page_number > 1:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message='That page contains no results'))
+        
+        self.request = request
+        self.page_number = page_number
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.count = count if count is not None else self._count(queryset, offset + len(rows))
+        return rows
+    
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+    
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+    
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+    
+    def _count(self, queryset, seen):
+        """Exact count, or the table estimate (never below the rows already seen)"""
+        if not queryset.query.where:
+            estimate = self._estimate_count(queryset)
+            if estimate >= self.ESTIMATE_THRESHOLD:
+                return max(estimate, seen)
+        return queryset.count()
+    
+    def _estimate_count(self, queryset):
+        """Return pg_class.reltuples for the queryset's table"""
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else -1
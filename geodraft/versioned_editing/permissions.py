@@ -3,11 +3,14 @@ Permission management for versioned editing.
 Implements role-based access control with Admin, Validator, and Editor roles.
 """
 from django.contrib.auth import get_user_model
+from rest_framework.permissions import BasePermission
 from geonode.groups.models import GroupProfile
 from .models import UserRole, EditBranch, MergeRequest
 
 User = get_user_model()
 
+ROLE_PRIORITY = {'admin': 3, 'validator': 2, 'editor': 1}
+
 
 class PermissionManager:
     """
@@ -19,34 +22,59 @@ class PermissionManager:
     - Editor: Can edit data in their group(s)
     """
     
+    @staticmethod
+    def _load_roles(user):
+        """
+        Get all roles of a user as a list of dicts.
+        Roles are queried once and cached on the user object for the rest of
+        the request, so repeated permission checks do not hit the database.
+        """
+        if not user.is_authenticated:
+            return []
+        if not hasattr(user, '_ve_roles_cache'):
+            user._ve_roles_cache = list(
+                UserRole.objects.filter(user=user).values(
+                    'group_id', 'role', 'can_approve_merges', 'can_manage_branches'
+                )
+            )
+        return user._ve_roles_cache
+    
+    @staticmethod
+    def _has_role(user, group, roles, **flags):
+        """Check the cached roles for a matching role in a group"""
+        group_id = getattr(group, 'pk', group)
+        return any(
+            role['group_id'] == group_id and role['role'] in roles and
+            all(role[flag] == value for flag, value in flags.items())
+            for role in PermissionManager._load_roles(user)
+        )
+    
+    @staticmethod
+    def clear_cached_roles(user):
+        """Drop role information cached on a user object"""
+        if hasattr(user, '_ve_roles_cache'):
+            del user._ve_roles_cache
+    
     @staticmethod
     def is_admin(user):
         """Check if user is an admin (superuser or has admin role)"""
         if user.is_superuser:
             return True
-        return UserRole.objects.filter(user=user, role='admin').exists()
+        return any(role['role'] == 'admin' for role in PermissionManager._load_roles(user))
     
     @staticmethod
     def is_validator_in_group(user, group):
         """Check if user is a validator in a specific group"""
         if user.is_superuser:
             return True
-        return UserRole.objects.filter(
-            user=user,
-            group=group,
-            role__in=['validator', 'admin']
-        ).exists()
+        return PermissionManager._has_role(user, group, ['validator', 'admin'])
     
     @staticmethod
     def is_editor_in_group(user, group):
         """Check if user is an editor in a specific group"""
         if user.is_superuser:
             return True
-        return UserRole.objects.filter(
-            user=user,
-            group=group,
-            role__in=['editor', 'validator', 'admin']
-        ).exists()
+        return PermissionManager._has_role(user, group, ['editor', 'validator', 'admin'])
     
     @staticmethod
     def can_create_branch(user, layer):
@@ -70,20 +98,38 @@ class PermissionManager:
             return True
         
         # Check if user is the branch creator
-        if branch.created_by == user:
+        if branch.created_by_id == user.id:
             return True
         
         # Check if user has editor role in branch's group
-        if branch.group:
-            return PermissionManager.is_editor_in_group(user, branch.group)
+        if branch.group_id:
+            return PermissionManager.is_editor_in_group(user, branch.group_id)
         
         return False
     
+    @staticmethod
+    def filter_editable_branches(user, branches):
+        """
+        Get the branches a user can edit.
+        Same rules as can_edit_branch, with roles resolved once for all branches.
+        """
+        if PermissionManager.is_admin(user):
+            return list(branches)
+        
+        group_ids = {
+            role['group_id'] for role in PermissionManager._load_roles(user)
+            if role['role'] in ['editor', 'validator', 'admin']
+        }
+        return [
+            branch for branch in branches
+            if branch.created_by_id == user.id or branch.group_id in group_ids
+        ]
+    
     @staticmethod
     def can_delete_branch(user, branch):
         """Check if user can delete a branch"""
         # Cannot delete master branch
-        if branch.is_master():
+        if branch.is_master:
             return False
         
         # Admins can delete any branch
@@ -91,15 +137,13 @@ class PermissionManager:
             return True
         
         # Users can delete their own branches
-        if branch.created_by == user:
+        if branch.created_by_id == user.id:
             # Check if they have branch management permission
-            if branch.group:
-                role = UserRole.objects.filter(
-                    user=user,
-                    group=branch.group,
+            if branch.group_id:
+                return PermissionManager._has_role(
+                    user, branch.group_id, ['editor', 'validator', 'admin'],
                     can_manage_branches=True
-                ).first()
-                return role is not None
+                )
             return True
         
         return False
@@ -129,13 +173,11 @@ class PermissionManager:
             return True
         
         # Check if user is validator in target branch's group
-        if merge_request.target_branch.group:
-            return UserRole.objects.filter(
-                user=user,
-                group=merge_request.target_branch.group,
-                role__in=['validator', 'admin'],
+        if merge_request.target_branch.group_id:
+            return PermissionManager._has_role(
+                user, merge_request.target_branch.group_id, ['validator', 'admin'],
                 can_approve_merges=True
-            ).exists()
+            )
         
         return False
     
@@ -160,30 +202,31 @@ class PermissionManager:
         if user.is_superuser:
             return GroupProfile.objects.all()
         
-        user_roles = UserRole.objects.filter(user=user).select_related('group')
-        return GroupProfile.objects.filter(
-            id__in=[role.group.id for role in user_roles]
-        )
+        return GroupProfile.objects.filter(versioned_editing_roles__user=user).distinct()
     
     @staticmethod
     def get_user_role_in_group(user, group):
-        """Get user's highest role in a group"""
+        """Get user's role in a group"""
         if user.is_superuser:
             return 'admin'
         
-        # Get highest role (admin > validator > editor)
-        role_priority = {'admin': 3, 'validator': 2, 'editor': 1}
-        roles = UserRole.objects.filter(user=user, group=group).values_list('role', flat=True)
-        
-        if not roles:
-            return None
-        
-        return max(roles, key=lambda r: role_priority.get(r, 0))
+        group_id = getattr(group, 'pk', group)
+        return next(
+            (role['role'] for role in PermissionManager._load_roles(user) if role['group_id'] == group_id),
+            None
+        )
+    
+    @staticmethod
+    def get_highest_role(user):
+        """Get user's highest role across all groups"""
+        roles = [role['role'] for role in PermissionManager._load_roles(user)]
+        return max(roles, key=lambda r: ROLE_PRIORITY.get(r, 0), default=None)
     
     @staticmethod
     def assign_role(admin_user, target_user, group, role, can_approve_merges=None, can_manage_branches=True):
         """
-        Assign a role to a user in a group.
+        Assign a role to a user in a group, replacing any role the user
+        already had in that group.
         Only admins can assign roles.
         """
         if not PermissionManager.can_manage_users(admin_user):
@@ -193,15 +236,18 @@ class PermissionManager:
         if role not in ['admin', 'validator', 'editor']:
             raise ValueError(f"Invalid role: {role}")
         
-        # Auto-set can_approve_merges for validators and admins
-        if can_approve_merges is None:
-            can_approve_merges = role in ['validator', 'admin']
+        # Validators and admins always approve merges (enforced by a DB constraint)
+        if role in ['validator', 'admin']:
+            can_approve_merges = True
+        elif can_approve_merges is None:
+            can_approve_merges = False
         
+        PermissionManager.clear_cached_roles(target_user)
         user_role, created = UserRole.objects.update_or_create(
             user=target_user,
             group=group,
-            role=role,
             defaults={
+                'role': role,
                 'can_approve_merges': can_approve_merges,
                 'can_manage_branches': can_manage_branches
             }
@@ -218,6 +264,7 @@ class PermissionManager:
         if not PermissionManager.can_manage_users(admin_user):
             raise PermissionError("Only admins can remove roles")
         
+        PermissionManager.clear_cached_roles(target_user)
         UserRole.objects.filter(
             user=target_user,
             group=group,
@@ -227,9 +274,27 @@ class PermissionManager:
     @staticmethod
     def get_group_members(group):
         """Get all users with roles in a group"""
-        user_roles = UserRole.objects.filter(group=group).select_related('user')
-        return {
-            'admins': [ur.user for ur in user_roles if ur.role == 'admin'],
-            'validators': [ur.user for ur in user_roles if ur.role == 'validator'],
-            'editors': [ur.user for ur in user_roles if ur.role == 'editor'],
-        }
+        members = {'admins': [], 'validators': [], 'editors': []}
+        for user_role in UserRole.objects.filter(group=group).select_related('user'):
+            members[f'{user_role.role}s'].append(user_role.user)
+        return members
+
+
+class CanApproveMerges(BasePermission):
+    """
+    Allows access to superusers and users holding a validator or admin role,
+    and checks the role applies to the group of the merge request's target
+    branch.
+    """
+    message = 'You do not have permission to review merge requests'
+    
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        if user.is_superuser:
+            return True
+        return PermissionManager.get_highest_role(user) in ['validator', 'admin']
+    
+    def has_object_permission(self, request, view, obj):
+        return PermissionManager.can_approve_merge_request(request.user, obj)
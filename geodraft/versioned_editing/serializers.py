@@ -1,13 +1,92 @@
 """
 REST framework serializers for versioned editing.
 """
+from django.db.models import F
 from rest_framework import serializers
+from rest_framework_gis.fields import GeometryField
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from .models import EditBranch, FeatureVersion, MergeRequest, MergeConflict
 
 
-class EditBranchSerializer(serializers.ModelSerializer):
+class EagerLoadingMixin:
+    """
+    Lets a serializer declare the relations it reads so that views can
+    load them together with the queryset instead of once per object.
+    """
+    select_related_fields = []
+    prefetch_related_fields = []
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Apply the serializer's select_related/prefetch_related plan"""
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+    
+    @classmethod
+    def setup_column_loading(cls, queryset):
+        """Load only the columns (own and related) the serializer reads"""
+        columns = {queryset.model._meta.pk.name}
+        for field in cls().fields.values():
+            if field.write_only or field.source == '*':
+                continue
+            path = field.source.split('.')
+            if isinstance(field, serializers.SlugRelatedField):
+                path.append(field.slug_field)
+            # Traversed relations must be loaded too, for select_related
+            for depth in range(1, len(path) + 1):
+                columns.add('__'.join(path[:depth]))
+        return queryset.only(*columns)
+
+
+class SparseFieldsMixin:
+    """
+    Builds specialised subclasses of a serializer restricted to a subset of
+    its fields (e.g. from a ``?fields=`` query parameter). Each subclass is
+    generated once per field set and reused, so pruned fields cost nothing
+    per object.
+    """
+    
+    @classmethod
+    def for_fields(cls, fields):
+        """Return a subclass of this serializer limited to the given fields"""
+        requested = set(fields)
+        fields = tuple(name for name in cls.Meta.fields if name in requested)
+        
+        sparse_classes = cls.__dict__.get('_sparse_classes')
+        if sparse_classes is None:
+            sparse_classes = cls._sparse_classes = {}
+        
+        if fields not in sparse_classes:
+            attrs = cls.get_sparse_attrs(fields)
+            # GeoFeatureModelSerializer writes id_field on Meta when first
+            # instantiated; set it explicitly so the parent's value is not inherited
+            attrs['Meta'] = type('Meta', (cls.Meta,), {
+                'fields': list(fields),
+                'id_field': 'id' if 'id' in fields else False,
+            })
+            sparse_classes[fields] = type(
+                f"{cls.__name__}_{'_'.join(fields)}", (cls,), attrs
+            )
+        return sparse_classes[fields]
+    
+    @classmethod
+    def get_sparse_attrs(cls, fields):
+        """Extra class attributes for a sparse subclass"""
+        return {}
+
+
+class EditBranchSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """Serializer for EditBranch model"""
+    select_related_fields = ['layer', 'created_by', 'parent_branch']
+    
+    id = serializers.UUIDField(source='uuid_external', read_only=True)
+    parent_branch = serializers.SlugRelatedField(
+        slug_field='uuid_external', queryset=EditBranch.objects.all(),
+        required=False, allow_null=True
+    )
     layer_name = serializers.CharField(source='layer.name', read_only=True)
     creator_username = serializers.CharField(source='created_by.username', read_only=True)
     parent_branch_name = serializers.CharField(source='parent_branch.name', read_only=True, allow_null=True)
@@ -22,8 +101,15 @@ class EditBranchSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_by', 'created_at', 'merged_at', 'updated_at']
 
 
-class FeatureVersionSerializer(GeoFeatureModelSerializer):
+class FeatureVersionSerializer(SparseFieldsMixin, EagerLoadingMixin, GeoFeatureModelSerializer):
     """Serializer for FeatureVersion model with GeoJSON support"""
+    select_related_fields = ['branch', 'created_by']
+    
+    id = serializers.UUIDField(source='uuid_external', read_only=True)
+    branch = serializers.SlugRelatedField(
+        slug_field='uuid_external', queryset=EditBranch.objects.all()
+    )
+    previous_version = serializers.SerializerMethodField()
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     creator_username = serializers.CharField(source='created_by.username', read_only=True)
     
@@ -32,14 +118,85 @@ class FeatureVersionSerializer(GeoFeatureModelSerializer):
         geo_field = 'geometry'
         fields = [
             'id', 'branch', 'branch_name', 'feature_id', 'version',
-            'geometry', 'properties', 'operation', 'is_deleted',
+            'geometry', 'properties', 'operation', 'is_deleted', 'previous_version',
             'created_by', 'creator_username', 'created_at', 'comment'
         ]
-        read_only_fields = ['id', 'created_by', 'created_at', 'feature_id', 'version']
+        read_only_fields = [
+            'id', 'created_by', 'created_at', 'feature_id', 'version', 'previous_version'
+        ]
+        # The column is nullable for delete tombstones, which are never
+        # written through this serializer (see FeatureVersionViewSet.soft_delete)
+        extra_kwargs = {
+            'geometry': {'required': True, 'allow_null': False},
+        }
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Fetch the previous version's external id without loading that row"""
+        queryset = super().setup_eager_loading(queryset)
+        return queryset.annotate(previous_version_uuid=F('previous_version__uuid_external'))
+    
+    def get_previous_version(self, obj):
+        if not obj.previous_version_id:
+            return None
+        if hasattr(obj, 'previous_version_uuid'):
+            return obj.previous_version_uuid
+        return obj.previous_version.uuid_external
+    
+    @classmethod
+    def get_sparse_attrs(cls, fields):
+        """GeoJSON needs a geometry member; render it as null unless requested"""
+        if 'geometry' in fields:
+            return {}
+        return {
+            'geometry': serializers.SerializerMethodField(),
+            'get_geometry': lambda self, obj: None,
+        }
+
+
+class FeatureVersionBBoxSerializer(FeatureVersionSerializer):
+    """
+    Read-only variant of FeatureVersionSerializer that renders the bounding
+    box of the feature instead of its full geometry.
+    Expects the queryset to be annotated with ``bbox``.
+    """
+    geometry = GeometryField(source='bbox', read_only=True)
 
 
-class MergeConflictSerializer(serializers.ModelSerializer):
+class FeatureVersionSummarySerializer(serializers.Serializer):
+    """
+    Read-only summary of a feature version.
+    Works on dicts from QuerySet.values() to avoid building model instances.
+    """
+    id = serializers.UUIDField(source='uuid_external')
+    version = serializers.IntegerField()
+    operation = serializers.CharField()
+    is_deleted = serializers.BooleanField()
+    branch = serializers.UUIDField(source='branch__uuid_external')
+    created_by = serializers.IntegerField(source='created_by_id')
+    created_at = serializers.DateTimeField()
+    
+    FIELDS = [
+        'uuid_external', 'version', 'operation', 'is_deleted',
+        'branch__uuid_external', 'created_by_id', 'created_at'
+    ]
+
+
+class MergeConflictSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """Serializer for MergeConflict model"""
+    select_related_fields = [
+        'source_version__branch', 'source_version__created_by',
+        'source_version__previous_version',
+        'target_version__branch', 'target_version__created_by',
+        'target_version__previous_version',
+        'merge_request', 'resolved_version',
+    ]
+    
+    id = serializers.UUIDField(source='uuid_external', read_only=True)
+    merge_request = serializers.SlugRelatedField(slug_field='uuid_external', read_only=True)
+    source_version = serializers.SlugRelatedField(slug_field='uuid_external', read_only=True)
+    target_version = serializers.SlugRelatedField(slug_field='uuid_external', read_only=True)
+    resolved_version = serializers.SlugRelatedField(slug_field='uuid_external', read_only=True)
     source_version_data = FeatureVersionSerializer(source='source_version', read_only=True)
     target_version_data = FeatureVersionSerializer(source='target_version', read_only=True)
     
@@ -50,20 +207,30 @@ class MergeConflictSerializer(serializers.ModelSerializer):
             'source_version', 'source_version_data',
             'target_version', 'target_version_data',
             'resolved', 'resolution_strategy',
-            'resolved_geometry', 'resolved_properties',
+            'resolved_version',
             'resolved_by', 'resolved_at'
         ]
         read_only_fields = ['id', 'merge_request', 'resolved_at']
 
 
-class MergeRequestSerializer(serializers.ModelSerializer):
+class MergeRequestSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """Serializer for MergeRequest model"""
+    select_related_fields = [
+        'source_branch__layer', 'target_branch__group', 'created_by', 'reviewed_by'
+    ]
+    
+    id = serializers.UUIDField(source='uuid_external', read_only=True)
+    source_branch = serializers.SlugRelatedField(
+        slug_field='uuid_external', queryset=EditBranch.objects.all()
+    )
+    target_branch = serializers.SlugRelatedField(
+        slug_field='uuid_external', queryset=EditBranch.objects.all()
+    )
     source_branch_name = serializers.CharField(source='source_branch.name', read_only=True)
     target_branch_name = serializers.CharField(source='target_branch.name', read_only=True)
     layer_name = serializers.CharField(source='source_branch.layer.name', read_only=True)
     creator_username = serializers.CharField(source='created_by.username', read_only=True)
     reviewer_username = serializers.CharField(source='reviewed_by.username', read_only=True, allow_null=True)
-    conflicts_count = serializers.SerializerMethodField()
     
     class Meta:
         model = MergeRequest
@@ -73,18 +240,15 @@ class MergeRequestSerializer(serializers.ModelSerializer):
             'title', 'description', 'status',
             'created_by', 'creator_username',
             'reviewed_by', 'reviewer_username', 'review_comment',
-            'conflicts_count',
+            'conflicts_count', 'unresolved_conflicts_count',
             'created_at', 'updated_at', 'reviewed_at'
         ]
         read_only_fields = [
             'id', 'created_by', 'reviewed_by', 'status',
+            'conflicts_count', 'unresolved_conflicts_count',
             'created_at', 'updated_at', 'reviewed_at'
         ]
     
-    def get_conflicts_count(self, obj):
-        """Get count of conflicts for this merge request"""
-        return obj.conflicts.count()
-    
     def validate(self, data):
         """Validate merge request data"""
         source = data.get('source_branch')
@@ -2,13 +2,73 @@
 Business logic services for versioned editing.
 Handles merge operations and conflict detection.
 """
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.gis.geos import GEOSGeometry
-from .models import EditBranch, FeatureVersion, MergeConflict
+from django.core.cache import cache
+from .models import EditBranch, FeatureVersion, MergeRequest, MergeConflict
+from .caching import get_branch_generation
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Columns needed to compare and merge the latest versions of features.
+# Geometries and properties are compared in the database and loaded only
+# for merged features.
+LATEST_FEATURE_FIELDS = ['id', 'feature_id', 'version', 'is_deleted', 'created_by']
+
+# Detected conflicts are keyed on branch generations; the timeout bounds
+# how long a missed invalidation can be served
+CONFLICTS_CACHE_TIMEOUT = 15 * 60
+
+
+def compare_versions(pairs):
+    """
+    Compare pairs of live (non-deleted) feature versions in the database.
+    Takes (source_version, target_version) tuples and returns a dictionary
+    mapping feature_id to (geometry_equal, properties_equal), computed in a
+    single query. Geometries with identical EWKB hashes are equal without
+    running ST_Equals; properties are compared as JSONB.
+    """
+    if not pairs:
+        return {}
+    
+    table = connection.ops.quote_name(FeatureVersion._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT s.feature_id,
+                   CASE WHEN s.geometry_hash = t.geometry_hash THEN TRUE
+                        ELSE ST_Equals(s.geometry, t.geometry) END,
+                   s.properties = t.properties
+            FROM unnest(%s::bigint[], %s::bigint[]) AS p(source_id, target_id)
+            JOIN {table} s ON s.id = p.source_id
+            JOIN {table} t ON t.id = p.target_id
+            """,
+            [
+                [source.id for source, target in pairs],
+                [target.id for source, target in pairs],
+            ]
+        )
+        return {
+            feature_id: (bool(geom_equal), bool(prop_equal))
+            for feature_id, geom_equal, prop_equal in cursor.fetchall()
+        }
+
+
+def get_latest_features(branch):
+    """
+    Get the latest version of each feature in a branch, without geometries
+    or properties. Returns a dictionary mapping feature_id to FeatureVersion.
+    """
+    # DISTINCT ON lets PostgreSQL return one row per feature
+    versions = FeatureVersion.objects.filter(
+        branch=branch
+    ).order_by('feature_id', '-version').distinct('feature_id').only(*LATEST_FEATURE_FIELDS)
+    # Stream rows instead of filling the queryset's result cache as well
+    return {version.feature_id: version for version in versions.iterator(chunk_size=2000)}
+
 
 class ConflictDetector:
     """
@@ -23,14 +83,24 @@ class ConflictDetector:
         conflicts = []
         
         # Get all feature versions from both branches
-        source_features = self._get_latest_features(source_branch)
-        target_features = self._get_latest_features(target_branch)
+        source_features = get_latest_features(source_branch)
+        target_features = get_latest_features(target_branch)
+        
+        # Compare every pair modified on both sides in one query
+        comparisons = compare_versions([
+            (source_version, target_features[feature_id])
+            for feature_id, source_version in source_features.items()
+            if feature_id in target_features and
+            self._both_modified(source_version, target_features[feature_id])
+        ])
         
         # Check for conflicts
         for feature_id, source_version in source_features.items():
             if feature_id in target_features:
                 target_version = target_features[feature_id]
-                conflict_type = self._detect_conflict_type(source_version, target_version)
+                conflict_type = self._detect_conflict_type(
+                    source_version, target_version, comparisons.get(feature_id)
+                )
                 
                 if conflict_type:
                     conflicts.append({
@@ -42,23 +112,69 @@ class ConflictDetector:
         
         return conflicts
     
-    def _get_latest_features(self, branch):
+    def detect_conflicts_cached(self, source_branch, target_branch):
         """
-        Get latest version of each feature in a branch.
-        Returns a dictionary mapping feature_id to FeatureVersion.
+        Detect conflicts between source and target branches, reusing the
+        result of a previous detection if neither branch has changed since.
+        Returns a list of conflict data dictionaries referencing versions by id.
         """
-        features = {}
-        versions = FeatureVersion.objects.filter(branch=branch).order_by('feature_id', '-version')
+        key = 'versioned_editing:conflicts:{}:{}:{}:{}'.format(
+            source_branch.id, get_branch_generation(source_branch.id),
+            target_branch.id, get_branch_generation(target_branch.id)
+        )
+        conflicts = cache.get(key)
         
-        for version in versions:
-            if version.feature_id not in features:
-                features[version.feature_id] = version
+        if conflicts is None:
+            conflicts = [
+                {
+                    'feature_id': conflict['feature_id'],
+                    'conflict_type': conflict['conflict_type'],
+                    'source_version_id': conflict['source_version'].id,
+                    'target_version_id': conflict['target_version'].id,
+                }
+                for conflict in self.detect_conflicts(source_branch, target_branch)
+            ]
+            cache.set(key, conflicts, timeout=CONFLICTS_CACHE_TIMEOUT)
         
-        return features
+        return conflicts
     
-    def _detect_conflict_type(self, source_version, target_version):
+    @transaction.atomic
+    def create_conflicts(self, merge_request):
+        """
+        Detect conflicts for a merge request and store them.
+        All conflict rows are written with batched INSERTs in one transaction,
+        together with the merge request's conflict counters.
+        Returns the list of created MergeConflict instances.
+        """
+        conflicts = self.detect_conflicts_cached(
+            merge_request.source_branch,
+            merge_request.target_branch
+        )
+        
+        created = MergeConflict.objects.bulk_create(
+            [MergeConflict(merge_request=merge_request, **conflict_data) for conflict_data in conflicts],
+            batch_size=500
+        )
+        
+        if created:
+            MergeRequest.objects.filter(pk=merge_request.pk).update(
+                conflicts_count=F('conflicts_count') + len(created),
+                unresolved_conflicts_count=F('unresolved_conflicts_count') + len(created)
+            )
+            merge_request.refresh_from_db(fields=['conflicts_count', 'unresolved_conflicts_count'])
+        
+        return created
+    
+    def _both_modified(self, source_version, target_version):
+        """Both versions were edited and still exist (tombstones carry no geometry)"""
+        return source_version.version > 1 and target_version.version > 1 and \
+            not source_version.is_deleted and not target_version.is_deleted
+    
+    def _detect_conflict_type(self, source_version, target_version, comparison=None):
         """
         Determine the type of conflict between two versions.
+        comparison is the (geometry_equal, properties_equal) result of
+        compare_versions for this pair, when both versions were modified.
         Returns conflict type string or None if no conflict.
         """
         # If both are base version (version 1), no conflict
@@ -66,11 +182,12 @@ class ConflictDetector:
             return None
         
         # If both have been modified
-        if source_version.version > 1 and target_version.version > 1:
-            # Check for geometry conflict
-            geom_conflict = not source_version.geometry.equals(target_version.geometry)
-            # Check for properties conflict
-            prop_conflict = source_version.properties != target_version.properties
+        if self._both_modified(source_version, target_version):
+            if comparison is None:
+                comparison = compare_versions([(source_version, target_version)])[source_version.feature_id]
+            geom_equal, prop_equal = comparison
+            geom_conflict = not geom_equal
+            prop_conflict = not prop_equal
             
             if geom_conflict and prop_conflict:
                 return 'BOTH'
@@ -102,10 +219,20 @@ class MergeService:
         logger.info(f"Merging branch {source_branch.name} into {target_branch.name}")
         
         # Get latest features from source branch
-        source_features = self._get_latest_features(source_branch)
-        target_features = self._get_latest_features(target_branch)
+        source_features = get_latest_features(source_branch)
+        target_features = get_latest_features(target_branch)
+        
+        # Compare features that are not obviously newer in the source in one query
+        comparisons = compare_versions([
+            (source_version, target_features[feature_id])
+            for feature_id, source_version in source_features.items()
+            if feature_id in target_features and
+            not source_version.is_deleted and
+            not target_features[feature_id].is_deleted and
+            source_version.version <= target_features[feature_id].version
+        ])
         
-        merged_count = 0
+        to_merge = []
         
         for feature_id, source_version in source_features.items():
             # Skip deleted features
@@ -113,68 +240,67 @@ class MergeService:
                 continue
             
             # Check if feature exists in target
-            if feature_id in target_features:
-                target_version = target_features[feature_id]
+            target_version = target_features.get(feature_id)
+            if target_version is not None:
+                # Deleted in the target and not edited in the source since
+                if target_version.is_deleted and source_version.version <= target_version.version:
+                    continue
+                
                 # Create new version in target if source is newer or different
                 if source_version.version > target_version.version or \
-                   not self._versions_equal(source_version, target_version):
-                    self._create_merged_version(source_version, target_branch)
-                    merged_count += 1
+                   not self._versions_equal(source_version, target_version, comparisons.get(feature_id)):
+                    to_merge.append((source_version, target_version))
             else:
                 # Feature doesn't exist in target, add it
-                self._create_merged_version(source_version, target_branch)
-                merged_count += 1
+                to_merge.append((source_version, None))
         
-        logger.info(f"Merged {merged_count} features from {source_branch.name} to {target_branch.name}")
-        return merged_count
-    
-    def _get_latest_features(self, branch):
-        """
-        Get latest version of each feature in a branch.
-        """
-        features = {}
-        versions = FeatureVersion.objects.filter(branch=branch).order_by('feature_id', '-version')
+        # Geometries and properties are only needed for the features being copied
+        payloads = self._load_payloads([source_version.id for source_version, _ in to_merge])
+        new_versions = [
+            self._merged_version_data(
+                source_version, target_version, source_branch, payloads[source_version.id]
+            )
+            for source_version, target_version in to_merge
+        ]
         
-        for version in versions:
-            if version.feature_id not in features:
-                features[version.feature_id] = version
+        # One batched INSERT for all merged features
+        if new_versions:
+            FeatureVersion.objects.bulk_create_versions(target_branch, new_versions, batch_size=1000)
+        merged_count = len(new_versions)
         
-        return features
+        logger.info(f"Merged {merged_count} features from {source_branch.name} to {target_branch.name}")
+        return merged_count
     
-    def _versions_equal(self, version1, version2):
+    def _versions_equal(self, version1, version2, comparison=None):
         """
         Check if two feature versions are equal.
+        comparison is the (geometry_equal, properties_equal) result of
+        compare_versions for this pair, if already computed.
         """
-        return (
-            version1.geometry.equals(version2.geometry) and
-            version1.properties == version2.properties
-        )
+        if version1.is_deleted or version2.is_deleted:
+            return version1.is_deleted == version2.is_deleted
+        if comparison is None:
+            comparison = compare_versions([(version1, version2)])[version1.feature_id]
+        return all(comparison)
+    
+    def _load_payloads(self, ids):
+        """Fetch the geometries and properties of the given versions with one query"""
+        return FeatureVersion.objects.only('id', 'geometry', 'properties').in_bulk(ids)
     
-    def _create_merged_version(self, source_version, target_branch):
+    def _merged_version_data(self, source_version, target_version, source_branch, payload):
         """
-        Create a merged version of a feature in the target branch.
+        Field values of the version that brings a source feature into the
+        target branch, on top of the target's latest version of it (if any).
         """
-        # Get next version number in target branch
-        latest_in_target = FeatureVersion.objects.filter(
-            branch=target_branch,
-            feature_id=source_version.feature_id
-        ).order_by('-version').first()
-        
-        next_version = (latest_in_target.version + 1) if latest_in_target else 1
-        
-        # Create new version
-        merged_version = FeatureVersion.objects.create(
-            branch=target_branch,
-            feature_id=source_version.feature_id,
-            version=next_version,
-            geometry=source_version.geometry,
-            properties=source_version.properties,
-            operation='MERGE',
-            created_by=source_version.created_by,
-            comment=f"Merged from branch {source_version.branch.name}"
-        )
-        
-        return merged_version
+        return {
+            'feature_id': source_version.feature_id,
+            'version': (target_version.version + 1) if target_version else 1,
+            'geometry': payload.geometry,
+            'properties': payload.properties,
+            'operation': 'MERGE',
+            'created_by_id': source_version.created_by_id,
+            'comment': f"Merged from branch {source_branch.name}",
+        }
 
 
 class ConflictResolver:
@@ -194,27 +320,65 @@ class ConflictResolver:
             resolved_by: User resolving the conflict
             manual_geometry: Geometry for manual resolution (optional)
             manual_properties: Properties for manual resolution (optional)
+        
+        Raises ValueError if the conflict is already resolved.
         """
+        # Lock the row so concurrent resolutions cannot both succeed
+        conflicts = MergeConflict.objects.select_for_update().filter(pk=conflict.pk)
+        if not conflicts.filter(resolved=False).exists():
+            raise ValueError(f"Conflict {conflict.pk} is already resolved")
+        
         if resolution_strategy == 'SOURCE':
-            conflict.resolved_geometry = conflict.source_version.geometry
-            conflict.resolved_properties = conflict.source_version.properties
+            resolved_version_id = conflict.source_version_id
         elif resolution_strategy == 'TARGET':
-            conflict.resolved_geometry = conflict.target_version.geometry if conflict.target_version else None
-            conflict.resolved_properties = conflict.target_version.properties if conflict.target_version else {}
+            resolved_version_id = conflict.target_version_id
         elif resolution_strategy == 'MANUAL':
             if manual_geometry is None or manual_properties is None:
                 raise ValueError("Manual resolution requires geometry and properties")
-            conflict.resolved_geometry = manual_geometry
-            conflict.resolved_properties = manual_properties
+            resolved_version_id = self._create_manual_version(
+                conflict, manual_geometry, manual_properties, resolved_by
+            ).id
         else:
             raise ValueError(f"Invalid resolution strategy: {resolution_strategy}")
         
-        conflict.resolution_strategy = resolution_strategy
-        conflict.resolved = True
-        conflict.resolved_by = resolved_by
-        conflict.resolved_at = timezone.now()
-        conflict.save()
+        values = {
+            'resolved_version_id': resolved_version_id,
+            'resolution_strategy': resolution_strategy,
+            'resolved': True,
+            'resolved_by': resolved_by,
+            'resolved_at': timezone.now(),
+        }
+        
+        MergeConflict.objects.filter(pk=conflict.pk).update(**values)
+        MergeRequest.objects.filter(
+            pk=conflict.merge_request_id,
+            unresolved_conflicts_count__gt=0
+        ).update(
+            unresolved_conflicts_count=F('unresolved_conflicts_count') - 1
+        )
+        
+        for field, value in values.items():
+            setattr(conflict, field, value)
         
         logger.info(f"Resolved conflict {conflict.id} using {resolution_strategy} strategy")
         
         return conflict
+    
+    def _create_manual_version(self, conflict, geometry, properties, resolved_by):
+        """
+        Record a manual resolution as a new version on the source branch,
+        so the merge carries it into the target.
+        """
+        source_version = conflict.source_version
+        
+        return FeatureVersion.objects.create(
+            branch_id=source_version.branch_id,
+            feature_id=conflict.feature_id,
+            version=FeatureVersion.objects.next_version(source_version.branch_id, conflict.feature_id),
+            geometry=geometry,
+            properties=properties,
+            operation='MERGE',
+            previous_version=source_version,
+            created_by=resolved_by,
+            comment="Manual conflict resolution"
+        )
@@ -2,10 +2,12 @@
 Signal handlers for versioned editing.
 Automatically create master branch for new vector layers.
 """
-from django.db.models.signals import post_save
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from geonode.layers.models import Dataset
-from .models import EditBranch
+from .models import EditBranch, FeatureVersion
+from .caching import bump_branch_generation
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,25 +17,39 @@ logger = logging.getLogger(__name__)
 def create_master_branch_for_layer(sender, instance, created, **kwargs):
     """
     Automatically create a 'master' branch when a new vector layer is created.
+    Runs once the layer's transaction commits, outside of the layer save.
     """
     if created and instance.subtype == 'vector':
-        try:
-            # Check if master branch already exists
-            master_exists = EditBranch.objects.filter(
-                layer=instance,
+        transaction.on_commit(lambda: ensure_master_branch(instance))
+
+
+def ensure_master_branch(layer):
+    """Create the master branch of a layer unless it already exists"""
+    try:
+        # uniq_master_per_layer rejects a second master branch
+        with transaction.atomic():
+            EditBranch.objects.create(
                 name='master',
-                parent_branch=None
-            ).exists()
-            
-            if not master_exists:
-                EditBranch.objects.create(
-                    name='master',
-                    description='Master branch',
-                    layer=instance,
-                    created_by=instance.owner,
-                    parent_branch=None,
-                    status='active'
-                )
-                logger.info(f"Created master branch for layer: {instance.name}")
-        except Exception as e:
-            logger.error(f"Failed to create master branch for layer {instance.name}: {e}")
+                description='Master branch',
+                layer=layer,
+                created_by=layer.owner,
+                parent_branch=None,
+                status='active'
+            )
+        logger.info(f"Created master branch for layer: {layer.name}")
+    except IntegrityError:
+        pass
+    except Exception as e:
+        logger.error(f"Failed to create master branch for layer {layer.name}: {e}")
+
+
+@receiver(post_save, sender=FeatureVersion)
+@receiver(post_delete, sender=FeatureVersion)
+def invalidate_branch_cache(sender, instance, **kwargs):
+    """
+    Invalidate cached data (e.g. detected conflicts) of the feature's branch.
+    The generation is bumped after commit so that a concurrent reader
+    cannot cache the pre-commit state under the new generation.
+    """
+    branch_id = instance.branch_id
+    transaction.on_commit(lambda: bump_branch_generation(branch_id))
@@ -0,0 +1,82 @@
+"""
+Background tasks for versioned editing.
+Runs long operations such as branch merges outside the HTTP request.
+"""
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from .models import EditBranch, MergeRequest
+from .services import MergeService
+from .audit import log_action
+import logging
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+@shared_task(name='versioned_editing.tasks.perform_merge')
+def perform_merge(merge_request_id, user_id, previous_status='pending'):
+    """
+    Merge the source branch of a merge request into its target branch.
+    The merge request is expected to be in the 'merging' status; it is set
+    back to previous_status if the merge fails.
+    """
+    merge_request = MergeRequest.objects.select_related(
+        'source_branch', 'target_branch'
+    ).get(id=merge_request_id)
+    user = User.objects.get(id=user_id)
+    
+    merge_service = MergeService()
+    now = timezone.now()
+    try:
+        # Merge, status updates and audit entry commit together
+        with transaction.atomic():
+            # The claim may have been released since (reset_stale_merges);
+            # the row lock keeps it from being released during the merge
+            claimed = MergeRequest.objects.select_for_update().filter(
+                pk=merge_request.pk, status='merging'
+            ).values_list('pk', flat=True)
+            if not claimed:
+                logger.warning(f"Merge request {merge_request_id} is no longer merging, skipping")
+                return
+            
+            merge_service.merge_branches(
+                merge_request.source_branch,
+                merge_request.target_branch
+            )
+            
+            # Update merge request
+            merge_request.status = 'merged'
+            merge_request.reviewed_by = user
+            merge_request.reviewed_at = now
+            merge_request.updated_at = now
+            MergeRequest.objects.bulk_update(
+                [merge_request],
+                ['status', 'reviewed_by', 'reviewed_at', 'updated_at']
+            )
+            
+            # Update source branch
+            source_branch = merge_request.source_branch
+            source_branch.status = 'merged'
+            source_branch.merged_at = now
+            source_branch.updated_at = now
+            EditBranch.objects.bulk_update(
+                [source_branch],
+                ['status', 'merged_at', 'updated_at']
+            )
+            
+            # Log action
+            log_action(
+                user=user,
+                action='APPROVE_MERGE_REQUEST',
+                entity_type='merge_request',
+                entity_id=merge_request.uuid_external,
+                details={'status': 'merged'}
+            )
+    except Exception as e:
+        logger.error(f"Merge of merge request {merge_request_id} failed: {e}")
+        merge_request.status = previous_status
+        merge_request.save(update_fields=['status', 'updated_at'])
+        raise
@@ -9,6 +9,22 @@ from versioned_editing.models import EditBranch
 register = template.Library()
 
 
+def _master_branch_layer_ids(request):
+    """
+    Ids of layers with an active master branch.
+    Loaded with one query and kept on the request, so pages showing many
+    layers don't query once per layer.
+    """
+    layer_ids = getattr(request, '_ve_master_branch_layer_ids', None)
+    if layer_ids is None:
+        layer_ids = set(EditBranch.objects.filter(
+            is_master=True,
+            status='active'
+        ).values_list('layer_id', flat=True))
+        request._ve_master_branch_layer_ids = layer_ids
+    return layer_ids
+
+
 @register.inclusion_tag('versioned_editing/includes/edit_button.html', takes_context=True)
 def show_edit_button(context, layer):
     """
@@ -21,17 +37,25 @@ def show_edit_button(context, layer):
     # Only show for vector layers
     can_show = layer.subtype == 'vector' if hasattr(layer, 'subtype') else False
     
-    # Check if user has edit permission
+    # Check if user has edit permission (once per layer and request)
     can_edit = False
     if user and user.is_authenticated and can_show:
-        can_edit = user.has_perm('change_resourcebase', layer.get_self_resource())
+        perm_cache = getattr(request, '_ve_edit_perms', None)
+        if perm_cache is None:
+            perm_cache = request._ve_edit_perms = {}
+        if layer.id not in perm_cache:
+            perm_cache[layer.id] = user.has_perm('change_resourcebase', layer.get_self_resource())
+        can_edit = perm_cache[layer.id]
     
     # Check if master branch exists
-    has_master_branch = EditBranch.objects.filter(
-        layer=layer,
-        name='master',
-        status='active'
-    ).exists()
+    if request is not None:
+        has_master_branch = layer.id in _master_branch_layer_ids(request)
+    else:
+        has_master_branch = EditBranch.objects.filter(
+            layer=layer,
+            is_master=True,
+            status='active'
+        ).exists()
     
     return {
         'layer': layer,
@@ -47,5 +71,11 @@ def get_active_branches_count(layer):
     """
     Get count of active branches for a layer.
     Usage: {{ layer|get_active_branches_count }}
+    Views rendering many layers should annotate the count up front, e.g.
+    Dataset.objects.annotate(active_branches_count=Count(
+        'edit_branches', filter=Q(edit_branches__status='active')))
     """
+    count = getattr(layer, 'active_branches_count', None)
+    if count is not None:
+        return count
     return EditBranch.objects.filter(layer=layer, status='active').count()
@@ -0,0 +1,99 @@
+"""
+Tests for versioned editing.
+"""
+import uuid
+from unittest import mock
+from django.contrib.gis.geos import Point
+from django.test import SimpleTestCase, TestCase
+from .models import EditBranch, FeatureVersion
+from .serializers import EditBranchSerializer, FeatureVersionSerializer
+from .services import MergeService
+
+
+class SparseFieldsTests(SimpleTestCase):
+    """Sparse serializers built with SparseFieldsMixin.for_fields"""
+    
+    def test_sparse_serializer_without_id_after_full_serializer(self):
+        feature_id = uuid.uuid4()
+        version = FeatureVersion(
+            feature_id=feature_id,
+            version=1,
+            geometry=Point(1, 2, srid=4326),
+            properties={'name': 'a'},
+            operation='UPDATE'
+        )
+        
+        # Instantiating the full serializer sets id_field on its Meta
+        FeatureVersionSerializer(version).data
+        
+        sparse_class = FeatureVersionSerializer.for_fields(['feature_id', 'geometry'])
+        data = sparse_class(version).data
+        
+        self.assertNotIn('id', data)
+        self.assertEqual(data['type'], 'Feature')
+        self.assertEqual(data['properties'], {'feature_id': str(feature_id)})
+        self.assertEqual(data['geometry']['coordinates'], [1.0, 2.0])
+    
+    def test_sparse_serializer_with_id(self):
+        sparse_class = FeatureVersionSerializer.for_fields(['id', 'feature_id'])
+        
+        self.assertEqual(sparse_class.Meta.id_field, 'id')
+        self.assertIs(FeatureVersionSerializer.for_fields(['feature_id', 'id']), sparse_class)
+
+
+class ColumnLoadingTests(SimpleTestCase):
+    """Columns derived from a serializer by EagerLoadingMixin.setup_column_loading"""
+    
+    def test_branch_serializer_columns(self):
+        queryset = EditBranchSerializer.setup_column_loading(EditBranch.objects.all())
+        columns, defer = queryset.query.deferred_loading
+        
+        self.assertFalse(defer)
+        self.assertEqual(set(columns), {
+            'id', 'uuid_external', 'name', 'description', 'status',
+            'created_at', 'merged_at', 'updated_at',
+            'layer', 'layer__name',
+            'created_by', 'created_by__username',
+            'parent_branch', 'parent_branch__name', 'parent_branch__uuid_external',
+        })
+
+
+class MergeAfterTargetDeleteTests(TestCase):
+    """Merging a feature whose latest target version is a delete tombstone"""
+    
+    def setUp(self):
+        self.feature_id = uuid.uuid4()
+        self.source = EditBranch(id=1, name='source')
+        self.target = EditBranch(id=2, name='target')
+        self.tombstone = FeatureVersion(
+            id=20, feature_id=self.feature_id, version=2, is_deleted=True,
+            operation='DELETE', previous_version_id=19
+        )
+    
+    def merge(self, source_version):
+        latest = {
+            'source': {self.feature_id: source_version},
+            'target': {self.feature_id: self.tombstone},
+        }
+        payloads = {source_version.id: FeatureVersion(geometry=Point(1, 2, srid=4326), properties={})}
+        with mock.patch('versioned_editing.services.get_latest_features',
+                        side_effect=lambda branch: latest[branch.name]), \
+                mock.patch.object(MergeService, '_load_payloads', return_value=payloads), \
+                mock.patch.object(FeatureVersion.objects, 'bulk_create_versions') as bulk_create:
+            merged_count = MergeService().merge_branches(self.source, self.target)
+        return merged_count, bulk_create
+    
+    def test_unchanged_source_does_not_restore_deleted_feature(self):
+        source_version = FeatureVersion(id=10, feature_id=self.feature_id, version=1, is_deleted=False)
+        merged_count, bulk_create = self.merge(source_version)
+        
+        self.assertEqual(merged_count, 0)
+        bulk_create.assert_not_called()
+    
+    def test_source_edited_after_delete_is_merged(self):
+        source_version = FeatureVersion(id=10, feature_id=self.feature_id, version=3, is_deleted=False)
+        merged_count, bulk_create = self.merge(source_version)
+        
+        self.assertEqual(merged_count, 1)
+        rows = bulk_create.call_args[0][1]
+        self.assertEqual(rows[0]['version'], 3)
@@ -9,6 +9,7 @@ from django.http import JsonResponse
 from geonode.layers.models import Dataset
 from .models import EditBranch, MergeRequest, FeatureVersion
 from .forms import CreateBranchForm, CreateMergeRequestForm
+from .permissions import PermissionManager
 
 
 @login_required
@@ -24,28 +25,39 @@ def layer_editor(request, layer_id):
         messages.error(request, "You don't have permission to edit this layer.")
         return redirect('layer_detail', layername=layer.alternate)
     
-    # Get or create master branch
-    master_branch, created = EditBranch.objects.get_or_create(
+    # Load the layer's active branches once and pick what the editor needs
+    branches = list(EditBranch.objects.filter(
         layer=layer,
-        name='master',
-        parent_branch=None,
-        defaults={
-            'description': 'Master branch',
-            'created_by': layer.owner,
-            'status': 'active'
-        }
-    )
+        status='active'
+    ).select_related('parent_branch', 'created_by'))
+    
+    # Get or create master branch
+    master_branch = next((branch for branch in branches if branch.is_master), None)
+    if master_branch is None:
+        master_branch, created = EditBranch.objects.get_or_create(
+            layer=layer,
+            is_master=True,
+            defaults={
+                'name': 'master',
+                'description': 'Master branch',
+                'created_by': layer.owner,
+                'parent_branch': None,
+                'status': 'active'
+            }
+        )
     
     # Get user's branches
-    user_branches = EditBranch.objects.filter(
-        layer=layer,
-        created_by=request.user,
-        status='active'
-    ).exclude(name='master')
+    user_branches = [
+        branch for branch in branches
+        if branch.created_by_id == request.user.id and not branch.is_master
+    ]
     
     # Get current branch from session or use master
-    current_branch_id = request.session.get(f'layer_{layer_id}_branch', str(master_branch.id))
-    current_branch = EditBranch.objects.filter(id=current_branch_id).first() or master_branch
+    current_branch_id = request.session.get(f'layer_{layer_id}_branch', str(master_branch.uuid_external))
+    current_branch = next(
+        (branch for branch in branches if str(branch.uuid_external) == current_branch_id),
+        master_branch
+    )
     
     context = {
         'layer': layer,
@@ -53,7 +65,7 @@ def layer_editor(request, layer_id):
         'current_branch': current_branch,
         'user_branches': user_branches,
         'can_create_branch': True,
-        'can_create_merge_request': user_branches.exists(),
+        'can_create_merge_request': bool(user_branches),
     }
     
     return render(request, 'versioned_editing/editor.html', context)
@@ -69,11 +81,16 @@ def branch_list(request, layer_id):
     branches = EditBranch.objects.filter(
         layer=layer,
         status__in=['active', 'merged']
-    ).select_related('created_by', 'parent_branch')
+    ).select_related('layer', 'created_by', 'parent_branch', 'group')
+    
+    editable_branch_ids = {
+        branch.id for branch in PermissionManager.filter_editable_branches(request.user, branches)
+    }
     
     context = {
         'layer': layer,
         'branches': branches,
+        'editable_branch_ids': editable_branch_ids,
     }
     
     return render(request, 'versioned_editing/branch_list.html', context)
@@ -84,18 +101,18 @@ def branch_detail(request, branch_id):
     """
     View details of a specific branch.
     """
-    branch = get_object_or_404(EditBranch, id=branch_id)
+    branch = get_object_or_404(EditBranch.objects.select_related('layer'), uuid_external=branch_id)
     
     # Get feature versions in this branch
     feature_versions = FeatureVersion.objects.filter(
         branch=branch,
         is_deleted=False
-    ).order_by('-created_at')[:50]
+    ).select_related('created_by', 'branch').order_by('-created_at')[:50]
     
     # Get merge requests for this branch
     merge_requests = MergeRequest.objects.filter(
         source_branch=branch
-    ).order_by('-created_at')
+    ).select_related('created_by', 'target_branch').order_by('-created_at')
     
     context = {
         'branch': branch,
@@ -112,23 +129,25 @@ def merge_request_detail(request, mr_id):
     """
     View details of a merge request and handle approval/rejection.
     """
-    merge_request = get_object_or_404(MergeRequest, id=mr_id)
+    merge_request = get_object_or_404(
+        MergeRequest.objects.select_related('source_branch__layer', 'target_branch', 'created_by'),
+        uuid_external=mr_id
+    )
     
-    # Check if user can approve (validator or admin)
-    can_approve = request.user.is_superuser or \
-                  getattr(request.user, 'profile', None) and \
-                  hasattr(request.user.profile, 'role') and \
-                  request.user.profile.role in ['validator', 'admin']
+    # Same rule as the API's CanApproveMerges permission
+    can_approve = PermissionManager.can_approve_merge_request(request.user, merge_request)
     
     # Get conflicts
-    conflicts = merge_request.conflicts.all()
+    conflicts = merge_request.conflicts.select_related(
+        'source_version__branch', 'target_version__branch', 'resolved_by'
+    )
     
     context = {
         'merge_request': merge_request,
         'layer': merge_request.source_branch.layer,
         'conflicts': conflicts,
         'can_approve': can_approve,
-        'is_creator': merge_request.created_by == request.user,
+        'is_creator': merge_request.created_by_id == request.user.id,
     }
     
     return render(request, 'versioned_editing/merge_request_detail.html', context)
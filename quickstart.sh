@@ -54,9 +54,13 @@ echo ""
 
 # Run migrations
 echo "📦 Running database migrations..."
-docker-compose exec -T django python manage.py makemigrations versioned_editing
 docker-compose exec -T django python manage.py migrate
 
+# The admin user search orders results by trigram similarity
+echo "🔎 Enabling trigram search on usernames..."
+docker-compose exec -T db psql -U postgres -d geonode -c "CREATE EXTENSION IF NOT EXISTS pg_trgm;"
+docker-compose exec -T db psql -U postgres -d geonode -c "CREATE INDEX IF NOT EXISTS user_username_trgm ON people_profile USING gin (username gin_trgm_ops);"
+
 echo ""
 echo "📁 Collecting static files..."
 docker-compose exec -T django python manage.py collectstatic --noinput